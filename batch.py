@@ -0,0 +1,105 @@
+"""
+Batch runner, compiling and running many programs on a process pool.
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from executor import Executor
+from program_io import CannedIO
+from syntax_analysis import SyntaxAnalyst
+
+
+def read_manifest(file_name):
+    """
+    Read a manifest. Every line not empty or starting with '#' is 'source file<TAB>input file', where the input file
+    can be left out. Relative paths are relative to the manifest. Return a list of (source file, input file or None).
+    """
+    base = os.path.dirname(os.path.abspath(file_name))
+    jobs = []
+    with open(file_name) as manifest:
+        for line in manifest:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) > 2:
+                raise Exception('Too many fields in manifest line \'' + line + '\'.')
+            source = os.path.join(base, fields[0])
+            input_file = os.path.join(base, fields[1]) if len(fields) == 2 and fields[1] else None
+            jobs.append((source, input_file))
+    return jobs
+
+
+def run_job(job, engine='switch', fuse=False):
+    """
+    Compile and run a program, reading the numbers in its input file.
+    Return a dict of the source file, input file, numbers written, error message or None, and seconds spent.
+    """
+    source, input_file = job
+    res = {'source': source, 'input': input_file, 'output': [], 'error': None}
+    start = time.perf_counter()
+    try:
+        numbers = []
+        if input_file is not None:
+            with open(input_file) as f:
+                numbers = [int(token) for token in f.read().split()]
+        io = CannedIO(numbers)
+        res['output'] = io.output
+        Executor(SyntaxAnalyst(source, fuse).analyse().pack(), engine, io).execute()
+    except Exception as e:
+        res['error'] = type(e).__name__ + ': ' + str(e)
+    res['output'] = [str(val) for val in res['output']]
+    res['seconds'] = time.perf_counter() - start
+    return res
+
+
+# Settings of jobs in a worker process, given once when the worker starts.
+_settings = {}
+
+
+def _init_worker(engine, fuse):
+    _settings['engine'] = engine
+    _settings['fuse'] = fuse
+
+
+def _run_in_worker(job):
+    return run_job(job, _settings['engine'], _settings['fuse'])
+
+
+def run_batch(jobs, engine='switch', fuse=False, processes=None, chunk_size=1):
+    """
+    Run jobs on a pool of worker processes, which are kept for the whole batch. Yield results in the order of jobs.
+    """
+    with multiprocessing.Pool(processes, _init_worker, (engine, fuse)) as pool:
+        for res in pool.imap(_run_in_worker, jobs, chunk_size):
+            yield res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile and run every program of a manifest.')
+    parser.add_argument('manifest', help='file of lines \'source file<TAB>input file\'')
+    parser.add_argument('--engine', choices=Executor.engines, default='switch', help='execution engine')
+    parser.add_argument('--fuse', action='store_true', help='fuse common instruction sequences into superinstructions')
+    parser.add_argument('--processes', type=int, help='worker processes, number of CPUs by default')
+    parser.add_argument('--chunk-size', type=int, default=1, help='jobs given to a worker at a time')
+    parser.add_argument('--output', help='save results to this JSON file instead of printing them')
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest)
+    results = run_batch(jobs, args.engine, args.fuse, args.processes, args.chunk_size)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(list(results), f, indent=2)
+        return
+    for res in results:
+        print('# ' + res['source'] + ('' if res['input'] is None else '\t' + res['input']))
+        for line in res['output']:
+            print(line)
+        if res['error'] is not None:
+            print('# ' + res['error'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Runtime benchmark of the programs in 'test files'.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from executor import Executor
+from register_machine import RegisterMachine
+from program_io import CannedIO
+from syntax_analysis import SyntaxAnalyst
+
+
+# Program -> numbers read by the program, for a scale.
+PROGRAMS = {
+    'find_prime.txt': lambda scale: [3000 * scale],
+    'call_return.txt': lambda scale: [300 * scale],
+    'big_int.txt': lambda scale: [10 ** (50 * scale) + 7, 10 ** (40 * scale) + 3],
+    'basic_all.txt': lambda scale: [3, 4, 2],
+    'mod.txt': lambda scale: [17 * scale, 5],
+    'for.txt': lambda scale: [],
+    'function_and_loop.txt': lambda scale: [],
+    'global_variable.txt': lambda scale: [],
+    'self_opr.txt': lambda scale: []
+}
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test files')
+
+
+def _run(packed, engine, numbers, profile=False):
+    """ Run a packed program once. Return the executor and seconds spent running. """
+    executor = Executor(packed, engine, CannedIO(numbers), profile)
+    start = time.perf_counter()
+    executor.execute()
+    return executor, time.perf_counter() - start
+
+
+def _run_register(rt, numbers, count=False):
+    """ Run a register table once. Return the machine and seconds spent running. """
+    machine = RegisterMachine(rt, CannedIO(numbers), count)
+    start = time.perf_counter()
+    machine.execute()
+    return machine, time.perf_counter() - start
+
+
+def bench(name, engine='switch', fuse=False, scale=1, repeat=5, backend='stack'):
+    """
+    Benchmark the execution of a program in 'test files'. Compiling is not measured.
+    Instructions run are counted in a separate profiling run, or counting run of the register backend, and peak
+    memory in a separate run under tracemalloc.
+    """
+    numbers = PROGRAMS[name](scale)
+    path = os.path.join(TEST_DIR, name)
+    if backend == 'register':
+        rt = SyntaxAnalyst(path, backend='register').analyse()
+        instructions = _run_register(rt, numbers, True)[0].dispatches
+
+        def run():
+            return _run_register(rt, numbers)[1]
+    else:
+        packed = SyntaxAnalyst(path, fuse).analyse().pack()
+        instructions = sum(_run(packed, engine, numbers, True)[0].profile.counts)
+
+        def run():
+            return _run(packed, engine, numbers)[1]
+
+    best = None
+    for i in range(repeat):
+        seconds = run()
+        best = seconds if best is None else min(best, seconds)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'instructions': instructions,
+        'seconds': best,
+        'instructions_per_second': instructions / best if best else None,
+        'peak_memory': peak
+    }
+
+
+def _compare(results, old_file):
+    with open(old_file) as f:
+        old = json.load(f)
+    print()
+    print('Compared with ' + old_file + ', backend ' + old.get('backend', 'stack') + ', engine ' + old['engine']
+          + ', fuse ' + str(old['fuse']) + ', scale ' + str(old['scale']) + ' (time now / time before):')
+    old = old['results']
+    for name, res in results.items():
+        if name in old and old[name]['seconds']:
+            print('%-24s%8.2f' % (name, res['seconds'] / old[name]['seconds']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark execution of the programs in \'test files\'.')
+    parser.add_argument('programs', nargs='*', help='programs to run, all by default')
+    parser.add_argument('--backend', choices=SyntaxAnalyst.backends, default='stack',
+                        help='run stack machine code with the engine given, or register machine code')
+    parser.add_argument('--engine', choices=Executor.engines, default='switch', help='execution engine')
+    parser.add_argument('--fuse', action='store_true', help='fuse common instruction sequences into superinstructions')
+    parser.add_argument('--scale', type=int, default=1, help='scale of program inputs')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each program, the best is kept')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file to save results to')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    args = parser.parse_args()
+    if args.backend == 'register' and (args.fuse or args.engine != 'switch'):
+        parser.error('--backend register can not be used with --fuse or --engine')
+
+    results = {}
+    print('%-24s%14s%12s%14s%14s' % ('program', 'instructions', 'seconds', 'ins/second', 'peak bytes'))
+    for name in args.programs or sorted(PROGRAMS):
+        if name not in PROGRAMS:
+            raise Exception('No canned input for \'' + name + '\'.')
+        res = bench(name, args.engine, args.fuse, args.scale, args.repeat, args.backend)
+        results[name] = res
+        print('%-24s%14d%12.6f%14.0f%14d' % (name, res['instructions'], res['seconds'],
+                                             res['instructions_per_second'] or 0, res['peak_memory']))
+    with open(args.output, 'w') as f:
+        json.dump({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': sys.version,
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'engine': args.engine,
+            'fuse': args.fuse,
+            'scale': args.scale,
+            'repeat': args.repeat,
+            'results': results
+        }, f, indent=2)
+    if args.compare is not None:
+        _compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
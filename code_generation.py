@@ -0,0 +1,194 @@
+"""
+Code generation module.
+"""
+from syntax_tree import Number, Variable, BinaryOp, Odd, SelfOp, Call, VarDecl, Assign, Read, Write, If, While, \
+    DoWhile, Repeat, For, Return, Block
+
+
+class CodeGenerator:
+    """
+    Generate instructions of a syntax tree into an instruction table.
+    A call right before returning, as the value of 'return' or as a statement the function returns after, becomes
+    a tail call 'tcl', which reuses the frame of current function instead of growing the stacks.
+    After generating, 'spans' holds the (first, last + 1) instruction index of every function, by name.
+    """
+    def __init__(self, it):
+        self._it = it
+        self._entries = {}
+        self.spans = {}
+        self._handlers = {
+            Number: self._number, Variable: self._variable, BinaryOp: self._binary_op, Odd: self._odd,
+            SelfOp: self._self_op, Call: self._call, VarDecl: self._var_decl, Assign: self._assign,
+            Read: self._read, Write: self._write, If: self._if, While: self._while, DoWhile: self._do_while,
+            Repeat: self._repeat, For: self._for, Return: self._return, Block: self._block
+        }
+
+    def generate(self, program):
+        """ Generate a whole program. Return the instruction table. """
+        for var in program.variables:
+            self._gen(var)
+        main_ins = self._it.gen('cal', None, self._it.next_line_num + 1)
+        end_ins = self._it.gen('jmp', 0, None)
+        for func in program.functions:
+            self._function(func)
+        main_ins[1] = self._entries['main']
+        end_ins[2] = self._it.next_line_num
+        return self._it
+
+    def _gen(self, node):
+        self._handlers[type(node)](node)
+
+    # A function taken from a cache is appended with its targets moved, instead of being generated.
+    def _function(self, func):
+        entry = self._it.next_line_num
+        self._entries[func.name] = entry
+        self._it.add_func(func.name, len(func.params), func.return_void)
+        if func.cached is not None:
+            self._it.append_code(func.cached.code, func.cached.entry,
+                                 {idx: self._entries[callee] for idx, callee in func.cached.calls.items()})
+        else:
+            for i in range(len(func.params)):
+                self._it.gen('str', -1, 0)
+            self._gen(func.body)
+            self._it.gen('opr', 0, 0)
+        self.spans[func.name] = (entry, self._it.next_line_num)
+
+    # Expressions.
+
+    def _number(self, node):
+        self._it.gen('lit', 0, node.value)
+
+    def _variable(self, node):
+        self._it.gen('lod', node.address, 0)
+
+    def _binary_op(self, node):
+        self._gen(node.left)
+        self._gen(node.right)
+        self._it.gen('opr', node.opr, 0)
+
+    def _odd(self, node):
+        self._gen(node.operand)
+        self._it.gen('opr', 9, 0)
+
+    def _self_op(self, node):
+        self._it.gen('lod', node.address, 0)
+        if not node.prefix:
+            self._it.gen('lod', node.address, 0)
+        self._it.gen('lit', 0, node.delta)
+        self._it.gen('opr', 2, 0)
+        self._it.gen('str', node.address, 0)
+        if node.prefix:
+            self._it.gen('lod', node.address, 0)
+
+    def _call(self, node):
+        for arg in node.args:
+            self._gen(arg)
+        self._it.gen('cal', self._entries[node.name], self._it.next_line_num + 1)
+
+    def _tail_call(self, node):
+        for arg in node.args:
+            self._gen(arg)
+        self._it.gen('tcl', self._entries[node.name], 0)
+
+    # Statements.
+
+    def _var_decl(self, node):
+        if node.init is None:
+            self._it.gen('lit', 0, 0)
+        else:
+            self._gen(node.init)
+        self._it.gen('str', -1, 0)
+
+    def _assign(self, node):
+        self._gen(node.value)
+        self._it.gen('str', node.address, 0)
+
+    def _read(self, node):
+        for var in node.variables:
+            self._it.gen('opr', 14, var.address)
+
+    def _write(self, node):
+        for val in node.values:
+            self._gen(val)
+            self._it.gen('opr', 15, 0)
+
+    # tail: if the function returns right after the statement.
+    def _if(self, node, tail=False):
+        end_ins = []
+        for cond, block in zip(node.conditions, node.blocks):
+            self._gen(cond)
+            jmp_ins = self._it.gen('jpc', 0, None)
+            self._block(block, tail)
+            end_ins.append(self._it.gen('jmp', 0, None))
+            jmp_ins[2] = self._it.next_line_num
+        if node.orelse is not None:
+            self._block(node.orelse, tail)
+        for ins in end_ins:
+            ins[2] = self._it.next_line_num
+
+    def _while(self, node):
+        jmp_back_idx = self._it.next_line_num
+        self._gen(node.condition)
+        jmp_out_ins = self._it.gen('jpc', 0, None)
+        self._gen(node.body)
+        self._it.gen('jmp', 0, jmp_back_idx)
+        jmp_out_ins[2] = self._it.next_line_num
+
+    def _do_while(self, node):
+        jmp_back_idx = self._it.next_line_num
+        self._gen(node.body)
+        self._gen(node.condition)
+        jmp_out_ins = self._it.gen('jpc', 0, None)
+        self._it.gen('jmp', 0, jmp_back_idx)
+        jmp_out_ins[2] = self._it.next_line_num
+
+    def _repeat(self, node):
+        jmp_back_idx = self._it.next_line_num
+        self._gen(node.body)
+        self._gen(node.condition)
+        jmp_out_ins = self._it.gen('jpc', 1, None)
+        self._it.gen('jmp', 0, jmp_back_idx)
+        jmp_out_ins[2] = self._it.next_line_num
+
+    def _for(self, node):
+        for statement in node.init:
+            self._gen(statement)
+        back_to_judge = self._it.next_line_num
+        self._gen(node.condition)
+        jmp_out_ins = self._it.gen('jpc', 0, None)
+        jmp_to_loop = self._it.gen('jmp', 0, None)
+        step_stat = self._it.next_line_num
+        for statement in node.step:
+            self._gen(statement)
+        self._it.gen('jmp', 0, back_to_judge)
+        jmp_to_loop[2] = self._it.next_line_num
+        self._gen(node.body)
+        self._it.gen('jmp', 0, step_stat)
+        jmp_out_ins[2] = self._it.next_line_num
+
+    def _return(self, node):
+        if isinstance(node.value, Call):
+            self._tail_call(node.value)
+            return
+        if node.value is not None:
+            self._gen(node.value)
+        self._it.gen('opr', 0, 0)
+
+    # tail: if the function returns right after the block. By default only after its outermost block.
+    def _block(self, node, tail=None):
+        if tail is None:
+            tail = node.release is None
+        for idx, statement in enumerate(node.statements):
+            if idx + 1 < len(node.statements):
+                nxt = node.statements[idx + 1]
+                returns = isinstance(nxt, Return) and nxt.value is None
+            else:
+                returns = tail
+            if returns and isinstance(statement, Call):
+                self._tail_call(statement)
+            elif returns and isinstance(statement, If):
+                self._if(statement, True)
+            else:
+                self._gen(statement)
+        if node.release is not None:
+            self._it.gen('opr', -1, node.release)
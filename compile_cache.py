@@ -0,0 +1,41 @@
+"""
+Compile cache module.
+"""
+
+
+class CompileCache:
+    """
+    What is kept from analysing a source file to analysing it again after an edit, so that only what changed is
+    analysed again.
+    lines:     tokens of every line, for LineCachedLexicalAnalyst.
+    globals:   symbols of the constants and variables defined before functions.
+    functions: function name -> CachedFunction, for functions analysed with the same globals.
+    After each analysis, 'reused' and 'analysed' tell how many functions were taken from the cache or analysed.
+    """
+    def __init__(self):
+        self.lines = {}
+        self.globals = None
+        self.functions = {}
+        self.reused = 0
+        self.analysed = 0
+
+
+class CachedFunction:
+    """
+    Instructions of a function analysed before.
+    symbols: symbols of the function from its return type to its end, as given by TokenStream.symbols.
+    defined: (name, number of parameters, return void or not) of every function defined before it.
+    code:    its instructions, with targets as they were when it started at instruction 'entry'.
+    calls:   index in 'code' of every 'cal' or 'tcl' -> name of the function called.
+    depends: name -> symbols of every function its code depends on by inlining (see Inliner), which it is
+             analysed again after a change of.
+    body:    its syntax tree to inline it with, None if it can't be inlined.
+    """
+    def __init__(self, symbols, defined, code, entry, calls, depends=None, body=None):
+        self.symbols = symbols
+        self.defined = defined
+        self.code = code
+        self.entry = entry
+        self.calls = calls
+        self.depends = {} if depends is None else depends
+        self.body = body
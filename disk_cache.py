@@ -0,0 +1,111 @@
+"""
+Disk cache module.
+"""
+import os
+import sys
+import glob
+import marshal
+import hashlib
+import tempfile
+
+
+class DiskCache:
+    """
+    Finished instruction tables kept on disk from one run to another, one file for each source file and set of
+    options generating it.
+    An entry is keyed by a hash of the source file, the options and the compiler itself, taken as the source of
+    every module next to this one, so that changing any of them misses the cache instead of loading stale code.
+    Entries are saved with marshal. Once the entries take more than 'max_bytes', the least recently used ones are
+    removed, as told by the modification time of their files, which is renewed whenever an entry is loaded.
+    """
+    _suffix = '.table'
+
+    # Hash of the compiler, computed once.
+    _compiler = None
+
+    def __init__(self, directory='compile cache', max_bytes=16 * 1024 * 1024):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        # Number of entries loaded and missed so far.
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def _compiler_hash(cls):
+        if cls._compiler is None:
+            digest = hashlib.sha256(sys.version.encode())
+            for name in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+                with open(name, 'rb') as module:
+                    digest.update(os.path.basename(name).encode() + b'\0' + module.read() + b'\0')
+            cls._compiler = digest.digest()
+        return cls._compiler
+
+    def key(self, input_file_name, options):
+        """
+        Get the key of a source file compiled with some options.
+        options: anything with a 'repr' telling apart options which give different tables.
+        """
+        digest = hashlib.sha256(self._compiler_hash())
+        digest.update(repr(options).encode() + b'\0')
+        with open(input_file_name, 'rb') as source:
+            digest.update(source.read())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._directory, key + self._suffix)
+
+    def load(self, key, valid=None):
+        """
+        Get what was stored with a key, or None if there is nothing.
+        valid: function telling if the data has the shape expected, an entry without it being missed.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as entry:
+                data = marshal.load(entry)
+            if valid is not None and not valid(data):
+                raise ValueError('Disk cache entry of an unexpected shape.')
+            os.utime(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def store(self, key, data):
+        """
+        Store data made of numbers, strings, None, lists, tuples and dicts with a key, then remove other entries least
+        recently used until the entries fit in 'max_bytes'. Data taking more than 'max_bytes' is not stored.
+        """
+        data = marshal.dumps(data)
+        if len(data) > self._max_bytes:
+            return
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+        # Written to a temporary file first, so that a run loading the entry meanwhile never sees half of it.
+        handle, temp = tempfile.mkstemp(dir=self._directory)
+        with os.fdopen(handle, 'wb') as entry:
+            entry.write(data)
+        os.replace(temp, self._path(key))
+        self._evict(self._path(key), len(data))
+
+    # keep: path of the entry just stored, taking 'kept_size' bytes, which is never removed.
+    def _evict(self, keep, kept_size):
+        entries = []
+        for name in glob.glob(os.path.join(self._directory, '*' + self._suffix)):
+            if name == keep:
+                continue
+            try:
+                stat = os.stat(name)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = kept_size + sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+            total -= size
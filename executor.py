@@ -1,11 +1,79 @@
+import operator
+import time
+
+from profiler import Profile
+from program_io import ConsoleIO
+from python_translation import PythonTranslator, TraceTranslator, TranslationError
+
+
 class Executor:
-    def __init__(self, instruction_table):
+    # Available execution engines.
+    # switch: decode every instruction through a chain of comparisons while running.
+    # table:  decode the instruction table into handler closures once, then run them from a tight loop.
+    # python: translate the instruction table into Python functions ahead of time, falling back to 'table' for
+    #         control flow which can not be structured and for recursive calls.
+    # trace:  'table', recording loops which get hot and running them as Python functions afterwards.
+    engines = ('switch', 'table', 'python', 'trace')
+
+    # Times a backward jump is taken before its loop is traced.
+    hot_loop = 50
+    # Most instructions in a trace.
+    trace_limit = 1000
+
+    # instruction_table: a PackedTable.
+    # io: object with 'read', 'write' and 'close', ConsoleIO by default.
+    # profile: count instructions and time functions while running with the handlers of 'table', whatever the
+    #          engine. The Profile is kept in 'profile' afterwards.
+    def __init__(self, instruction_table, engine='switch', io=None, profile=False):
+        if engine not in self.engines:
+            raise Exception('Unknown execution engine \'' + str(engine) + '\'.')
         self._instructionTable = instruction_table
+        self._engine = engine
+        self._io = ConsoleIO() if io is None else io
+        self._profile = profile
+        self.profile = None
         self._dataStack = []
         self._variableStack = []
+        # Return address and frame pointer of callers.
         self._funcCallStack = []
+        # Frame pointer, offset of the first variable of current function in variable stack.
+        self._framePointer = 0
+
+    # Binary operations used by superinstructions, keyed by operation code.
+    _arithmetic = {
+        1: operator.sub, 2: operator.add, 10: operator.mul,
+        11: operator.truediv, 12: operator.mod, 13: operator.xor, 16: operator.and_
+    }
+    _comparison = {
+        3: operator.gt, 4: operator.lt, 5: operator.ge,
+        6: operator.le, 7: operator.eq, 8: operator.ne
+    }
+
+    @staticmethod
+    def _var_offset(frame_pointer, address):
+        """
+        Offset of a variable in variable stack.
+        address: slot in current frame, or '-2 - index' for a global variable.
+        """
+        if address >= 0:
+            return frame_pointer + address
+        return address * -1 - 2
 
     def execute(self):
+        """ Run the instruction table with the selected engine. """
+        try:
+            if self._profile:
+                self._execute_profile()
+            elif self._engine == 'python' and self._execute_python():
+                return
+            elif self._engine in ('table', 'python', 'trace'):
+                self._execute_table()
+            else:
+                self._execute_switch()
+        finally:
+            self._io.close()
+
+    def _execute_switch(self):
         """
         Instruction code:
         0: lit, put an instant number to the top of the data stack
@@ -15,56 +83,80 @@ class Executor:
         4: jmp, jump to and execute a specific instruction without any condition
         5: jpc, jump to and execute a specific instruction if condition is satisfied
         6: opr, operation
+        Superinstructions:
+        7: inc, add a number to a variable
+        8: opl, operate on stack-top and an instant number
+        9: jcs, compare two numbers on stack-top, jump if comparison fails
+        10: jcv, compare two variables, jump if comparison fails
+        11: jcl, compare a variable with an instant number, jump if comparison fails
+        12: tcl, call a function in place of current one, which returns to where current one would
         """
-        cur_ins_num = 0
-        len_it = len(self._instructionTable)
-        while cur_ins_num != len_it:
-            ins = self._instructionTable[cur_ins_num]
-            ins_code = ins[0]
-            arg1 = ins[1]
-            arg2 = ins[2]
-            # print(ins)
+        code = self._instructionTable.code
+        data_stack = self._dataStack
+        var_stack = self._variableStack
+        func_call_stack = self._funcCallStack
+        consts = self._instructionTable.consts
+        read = self._io.read
+        write = self._io.write
+        frame_pointer = self._framePointer
+        cur_ins_addr = 0
+        len_it = len(code)
+        while cur_ins_addr != len_it:
+            ins_code = code[cur_ins_addr]
+            arg1 = code[cur_ins_addr + 1]
+            arg2 = code[cur_ins_addr + 2]
+            # print(ins_code, arg1, arg2)
             if ins_code == 0:
                 # usage: lit 0 value
-                self._dataStack.append(arg2)
-                cur_ins_num += 1
+                data_stack.append(consts[arg2])
+                cur_ins_addr += 3
             elif ins_code == 1:
-                # usage: lod distance_from_top 0
+                # usage: lod address 0
                 if arg1 >= 0:
-                    offset = len(self._variableStack) - 1 - arg1
+                    offset = frame_pointer + arg1
                 else:
                     # global variables
                     offset = arg1 * -1 - 2
-                self._dataStack.append(self._variableStack[offset])
-                cur_ins_num += 1
+                data_stack.append(var_stack[offset])
+                cur_ins_addr += 3
             elif ins_code == 2:
-                # usage: str distance_from_top 0
-                offset = len(self._variableStack) - 1 - arg1
+                # usage: str address 0
+                # Address -1 stands for a new variable.
                 if arg1 == -1:
-                    self._variableStack.append(0)
-                elif arg1 < 0:
-                    offset = arg1 * -1 - 2
-                self._variableStack[offset] = self._dataStack.pop()
-                cur_ins_num += 1
+                    var_stack.append(data_stack.pop())
+                else:
+                    if arg1 >= 0:
+                        offset = frame_pointer + arg1
+                    else:
+                        offset = arg1 * -1 - 2
+                    var_stack[offset] = data_stack.pop()
+                cur_ins_addr += 3
             elif ins_code == 3:
-                # usage: cal function_start_instruction_index return_instruction_index
-                self._funcCallStack.append(arg2)
-                cur_ins_num = arg1
+                # usage: cal function_start_address return_address
+                func_call_stack.append(arg2)
+                func_call_stack.append(frame_pointer)
+                frame_pointer = len(var_stack)
+                cur_ins_addr = arg1
+            elif ins_code == 12:
+                # usage: tcl function_start_address 0
+                # Arguments are on data stack already, so current frame is dropped and reused by the callee.
+                del var_stack[frame_pointer:]
+                cur_ins_addr = arg1
             elif ins_code == 4:
-                # usage: jmp 0 destination_instruction_index
-                cur_ins_num = arg2
+                # usage: jmp 0 destination_address
+                cur_ins_addr = arg2
             elif ins_code == 5:
-                # usage: jpc jump_condition destination_instruction_index
-                res = self._dataStack.pop()
+                # usage: jpc jump_condition destination_address
+                res = data_stack.pop()
                 if res == arg1:
-                    cur_ins_num = arg2
+                    cur_ins_addr = arg2
                 else:
-                    cur_ins_num += 1
+                    cur_ins_addr += 3
             elif ins_code == 6:
                 # usage: opr operation_code parameter
                 # Operation code:
                 # -1: pop values from stack. parameter: time of popping
-                #  0: return from a function
+                #  0: return from a function, dropping its frame
                 #  1: minus, -
                 #  2: add, +
                 #  3: bigger than, >
@@ -78,88 +170,569 @@ class Executor:
                 # 11: divide, /
                 # 12: reduction, %
                 # 13: xor, XOR
-                # 14: read. parameter: variable distance from the top of the stack.
+                # 14: read. parameter: variable address.
                 # 15: write.
-                cur_ins_num += 1
+                # 16: mask, &. Generated for '%' by a power of two.
+                cur_ins_addr += 3
                 if arg1 == -1:
-                    for i in range(arg2):
-                        self._variableStack.pop()
+                    del var_stack[len(var_stack) - arg2:]
                 elif arg1 == 0:
-                    cur_ins_num = self._funcCallStack.pop()
+                    del var_stack[frame_pointer:]
+                    frame_pointer = func_call_stack.pop()
+                    cur_ins_addr = func_call_stack.pop()
                 elif arg1 == 1:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
-                    self._dataStack.append(b - a)
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b - a)
                 elif arg1 == 2:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
-                    self._dataStack.append(b + a)
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b + a)
                 elif arg1 == 3:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
+                    a = data_stack.pop()
+                    b = data_stack.pop()
                     if b > a:
-                        self._dataStack.append(1)
+                        data_stack.append(1)
                     else:
-                        self._dataStack.append(0)
+                        data_stack.append(0)
                 elif arg1 == 4:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
+                    a = data_stack.pop()
+                    b = data_stack.pop()
                     if b < a:
-                        self._dataStack.append(1)
+                        data_stack.append(1)
                     else:
-                        self._dataStack.append(0)
+                        data_stack.append(0)
                 elif arg1 == 5:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
+                    a = data_stack.pop()
+                    b = data_stack.pop()
                     if b >= a:
-                        self._dataStack.append(1)
+                        data_stack.append(1)
                     else:
-                        self._dataStack.append(0)
+                        data_stack.append(0)
                 elif arg1 == 6:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
+                    a = data_stack.pop()
+                    b = data_stack.pop()
                     if b <= a:
-                        self._dataStack.append(1)
+                        data_stack.append(1)
                     else:
-                        self._dataStack.append(0)
+                        data_stack.append(0)
                 elif arg1 == 7:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
+                    a = data_stack.pop()
+                    b = data_stack.pop()
                     if b == a:
-                        self._dataStack.append(1)
+                        data_stack.append(1)
                     else:
-                        self._dataStack.append(0)
+                        data_stack.append(0)
                 elif arg1 == 8:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
+                    a = data_stack.pop()
+                    b = data_stack.pop()
                     if b != a:
-                        self._dataStack.append(1)
+                        data_stack.append(1)
                     else:
-                        self._dataStack.append(0)
+                        data_stack.append(0)
                 elif arg1 == 9:
-                    a = self._dataStack.pop()
-                    self._dataStack.append(a & 1)
+                    a = data_stack.pop()
+                    data_stack.append(a & 1)
                 elif arg1 == 10:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
-                    self._dataStack.append(b * a)
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b * a)
                 elif arg1 == 11:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
-                    self._dataStack.append(b / a)
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b / a)
+                # Mask is checked right before '%' it is generated for, so that it costs no more comparisons.
+                elif arg1 == 16:
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b & a)
                 elif arg1 == 12:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
-                    self._dataStack.append(b % a)
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b % a)
                 elif arg1 == 13:
-                    a = self._dataStack.pop()
-                    b = self._dataStack.pop()
-                    self._dataStack.append(b ^ a)
+                    a = data_stack.pop()
+                    b = data_stack.pop()
+                    data_stack.append(b ^ a)
                 elif arg1 == 14:
-                    offset = len(self._variableStack) - 1 - arg2
-                    if arg2 < 0:
-                        offset = arg2 * -1 - 2
-                    self._variableStack[offset] = int(input())
+                    var_stack[self._var_offset(frame_pointer, arg2)] = read()
                 elif arg1 == 15:
-                    print(self._dataStack.pop())
-            # print(self._dataStack)
+                    write(data_stack.pop())
+            elif ins_code == 7:
+                # usage: inc address value
+                offset = self._var_offset(frame_pointer, arg1)
+                var_stack[offset] += consts[arg2]
+                cur_ins_addr += 3
+            elif ins_code == 8:
+                # usage: opl operation_code value
+                a = data_stack.pop()
+                if arg1 in self._comparison:
+                    data_stack.append(1 if self._comparison[arg1](a, consts[arg2]) else 0)
+                else:
+                    data_stack.append(self._arithmetic[arg1](a, consts[arg2]))
+                cur_ins_addr += 3
+            elif ins_code == 9:
+                # usage: jcs operation_code destination_address
+                a = data_stack.pop()
+                b = data_stack.pop()
+                if self._comparison[arg1](b, a):
+                    cur_ins_addr += 3
+                else:
+                    cur_ins_addr = arg2
+            elif ins_code == 10:
+                # usage: jcv operation_code destination_address address_a address_b
+                a = var_stack[self._var_offset(frame_pointer, code[cur_ins_addr + 3])]
+                b = var_stack[self._var_offset(frame_pointer, code[cur_ins_addr + 4])]
+                if self._comparison[arg1](a, b):
+                    cur_ins_addr += 5
+                else:
+                    cur_ins_addr = arg2
+            elif ins_code == 11:
+                # usage: jcl operation_code destination_address address value
+                a = var_stack[self._var_offset(frame_pointer, code[cur_ins_addr + 3])]
+                if self._comparison[arg1](a, consts[code[cur_ins_addr + 4]]):
+                    cur_ins_addr += 5
+                else:
+                    cur_ins_addr = arg2
+            # print(data_stack)
+
+    def _execute_python(self):
+        """ Run the program translated into Python. Return False if it can not be translated. """
+        try:
+            program = PythonTranslator(self._instructionTable).compile()
+        except TranslationError:
+            return False
+        program(self._io.read, self._io.write)
+        return True
+
+    def _execute_table(self):
+        """
+        Run the handlers produced by '_decode'. Every handler returns the address of the next instruction.
+        """
+        handlers = self._decode(self._engine == 'trace')
+        cur_ins_addr = 0
+        len_it = len(handlers)
+        while cur_ins_addr != len_it:
+            cur_ins_addr = handlers[cur_ins_addr]()
+
+    def _execute_profile(self):
+        """
+        Run the handlers produced by '_decode' like '_execute_table', counting every instruction run and timing
+        every function called.
+        """
+        handlers = self._decode()
+        code = self._instructionTable.code
+        profile = Profile(self._instructionTable)
+        counts = profile.counts
+        functions = profile.functions
+        timer = time.perf_counter
+        # Functions being run: [entrance address, time called, time spent in callees].
+        calls = []
+        # Number of unfinished calls of each function.
+        active = dict.fromkeys(functions, 0)
+        start = timer()
+        cur_ins_addr = 0
+        len_it = len(handlers)
+        while cur_ins_addr != len_it:
+            counts[cur_ins_addr] += 1
+            ins_code = code[cur_ins_addr]
+            nxt = handlers[cur_ins_addr]()
+            if ins_code == 3:
+                functions[nxt][0] += 1
+                active[nxt] += 1
+                calls.append([nxt, timer(), 0.0])
+            elif ins_code == 6 and code[cur_ins_addr + 1] == 0 or ins_code == 12:
+                entry, called, callees = calls.pop()
+                elapsed = timer() - called
+                active[entry] -= 1
+                if not active[entry]:
+                    functions[entry][1] += elapsed
+                functions[entry][2] += elapsed - callees
+                if calls:
+                    calls[-1][2] += elapsed
+                # A tail call returns from current function and calls another one at once.
+                if ins_code == 12:
+                    functions[nxt][0] += 1
+                    active[nxt] += 1
+                    calls.append([nxt, timer(), 0.0])
+            cur_ins_addr = nxt
+        profile.time = timer() - start
+        self.profile = profile
+
+    def _decode(self, trace=False):
+        """
+        Translate every instruction of the table into a handler closure, placed at the address of the instruction.
+        Instruction code, operation code, constants and stack offsets are resolved here once, so that running an
+        instruction costs a single call.
+        trace: count backward jumps, and replace the handler at the head of a hot loop by a recorded trace.
+        """
+        data_stack = self._dataStack
+        var_stack = self._variableStack
+        func_call_stack = self._funcCallStack
+        push = data_stack.append
+        pop = data_stack.pop
+        read = self._io.read
+        write = self._io.write
+        # Changed by handlers of 'cal' and 'opr 0'. Kept by 'tcl', which reuses current frame.
+        frame_pointer = self._framePointer
+
+        # Variable address to (is a local variable, offset in frame or in variable stack).
+        def var_offset(address):
+            if address >= 0:
+                return True, address
+            return False, address * -1 - 2
+
+        # 0: lit
+        def lit(nxt, arg1, arg2):
+            def handler():
+                push(arg2)
+                return nxt
+            return handler
+
+        # 1: lod
+        def lod(nxt, arg1, arg2):
+            local, offset = var_offset(arg1)
+            if local:
+                def handler():
+                    push(var_stack[frame_pointer + offset])
+                    return nxt
+                return handler
+
+            def handler():
+                push(var_stack[offset])
+                return nxt
+            return handler
+
+        # 2: str
+        def sto(nxt, arg1, arg2):
+            if arg1 == -1:
+                append = var_stack.append
+
+                def handler():
+                    append(pop())
+                    return nxt
+                return handler
+            local, offset = var_offset(arg1)
+            if local:
+                def handler():
+                    var_stack[frame_pointer + offset] = pop()
+                    return nxt
+                return handler
+
+            def handler():
+                var_stack[offset] = pop()
+                return nxt
+            return handler
+
+        # 3: cal
+        def cal(nxt, arg1, arg2):
+            append = func_call_stack.append
+
+            def handler():
+                nonlocal frame_pointer
+                append(arg2)
+                append(frame_pointer)
+                frame_pointer = len(var_stack)
+                return arg1
+            return handler
+
+        # 12: tcl
+        def tcl(nxt, arg1, arg2):
+            def handler():
+                del var_stack[frame_pointer:]
+                return arg1
+            return handler
+
+        # 4: jmp
+        def jmp(nxt, arg1, arg2):
+            if not trace or arg2 >= nxt:
+                def handler():
+                    return arg2
+                return handler
+            count = 0
+            hot_loop = self.hot_loop
+
+            def handler():
+                nonlocal count
+                count += 1
+                if count == hot_loop:
+                    count = 0
+                    return record(arg2)
+                return arg2
+            return handler
+
+        # Loop head -> function running the loop, or None if the loop can not be traced.
+        traces = {}
+
+        # Run one iteration of the loop at 'head' recording every instruction, then translate the trace and let
+        # it run the loop from now on. Return the address to continue at.
+        # Recording is given up if the iteration leaves the loop, and tried again once the loop gets hot again.
+        def record(head):
+            if head in traces:
+                return head
+            frame_size = len(var_stack) - frame_pointer
+            path = []
+            seen = set()
+            address = head
+            while True:
+                ins = decoded[address]
+                # Give up on calls, returns, inner loops and traces of inner loops.
+                if ins[0] == 3 or ins[0] == 12 or ins[0] == 6 and ins[1] == 0 or address in seen \
+                        or address != head and address in traces or len(path) == self.trace_limit:
+                    return address
+                seen.add(address)
+                # A jump goes straight to its target, as the handler of a backward one counts the loop and could
+                # start recording another one from within this one.
+                nxt = ins[2] if ins[0] == 4 else handlers[address]()
+                path.append((address, nxt))
+                if nxt == head:
+                    break
+                if nxt == len(handlers):
+                    return nxt
+                address = nxt
+            try:
+                run = TraceTranslator(decoded, frame_size).compile(path, read, write)
+            except TranslationError:
+                traces[head] = None
+                return head
+            traces[head] = run
+
+            def handler():
+                return run(var_stack, frame_pointer)
+            handlers[head] = handler
+            return head
+
+        # 5: jpc
+        def jpc(nxt, arg1, arg2):
+            def handler():
+                if pop() == arg1:
+                    return arg2
+                return nxt
+            return handler
+
+        # 6: opr, see '_execute_switch' for the meaning of each operation code.
+        def opr_pop(nxt, arg2):
+            def handler():
+                del var_stack[len(var_stack) - arg2:]
+                return nxt
+            return handler
+
+        def opr_return(nxt, arg2):
+            pop_call = func_call_stack.pop
+
+            def handler():
+                nonlocal frame_pointer
+                del var_stack[frame_pointer:]
+                frame_pointer = pop_call()
+                return pop_call()
+            return handler
+
+        def opr_minus(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() - a)
+                return nxt
+            return handler
+
+        def opr_add(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() + a)
+                return nxt
+            return handler
+
+        def opr_bigger(nxt, arg2):
+            def handler():
+                a = pop()
+                push(1 if pop() > a else 0)
+                return nxt
+            return handler
+
+        def opr_smaller(nxt, arg2):
+            def handler():
+                a = pop()
+                push(1 if pop() < a else 0)
+                return nxt
+            return handler
+
+        def opr_bigger_equal(nxt, arg2):
+            def handler():
+                a = pop()
+                push(1 if pop() >= a else 0)
+                return nxt
+            return handler
+
+        def opr_smaller_equal(nxt, arg2):
+            def handler():
+                a = pop()
+                push(1 if pop() <= a else 0)
+                return nxt
+            return handler
+
+        def opr_equal(nxt, arg2):
+            def handler():
+                a = pop()
+                push(1 if pop() == a else 0)
+                return nxt
+            return handler
+
+        def opr_not_equal(nxt, arg2):
+            def handler():
+                a = pop()
+                push(1 if pop() != a else 0)
+                return nxt
+            return handler
+
+        def opr_odd(nxt, arg2):
+            def handler():
+                push(pop() & 1)
+                return nxt
+            return handler
+
+        def opr_multiply(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() * a)
+                return nxt
+            return handler
+
+        def opr_divide(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() / a)
+                return nxt
+            return handler
+
+        def opr_reduction(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() % a)
+                return nxt
+            return handler
+
+        def opr_xor(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() ^ a)
+                return nxt
+            return handler
+
+        def opr_mask(nxt, arg2):
+            def handler():
+                a = pop()
+                push(pop() & a)
+                return nxt
+            return handler
+
+        def opr_read(nxt, arg2):
+            local, offset = var_offset(arg2)
+
+            def handler():
+                var_stack[frame_pointer + offset if local else offset] = read()
+                return nxt
+            return handler
+
+        def opr_write(nxt, arg2):
+            def handler():
+                write(pop())
+                return nxt
+            return handler
+
+        operations = {
+            -1: opr_pop, 0: opr_return, 1: opr_minus, 2: opr_add,
+            3: opr_bigger, 4: opr_smaller, 5: opr_bigger_equal, 6: opr_smaller_equal,
+            7: opr_equal, 8: opr_not_equal, 9: opr_odd, 10: opr_multiply,
+            11: opr_divide, 12: opr_reduction, 13: opr_xor, 14: opr_read,
+            15: opr_write, 16: opr_mask
+        }
+
+        def opr(nxt, arg1, arg2):
+            if arg1 not in operations:
+                raise Exception('Operation code error.')
+            return operations[arg1](nxt, arg2)
+
+        # 7: inc
+        def inc(nxt, arg1, arg2):
+            local, offset = var_offset(arg1)
+            if local:
+                def handler():
+                    var_stack[frame_pointer + offset] += arg2
+                    return nxt
+                return handler
+
+            def handler():
+                var_stack[offset] += arg2
+                return nxt
+            return handler
+
+        # 8: opl
+        def opl(nxt, arg1, arg2):
+            if arg1 in self._comparison:
+                test = self._comparison[arg1]
+
+                def handler():
+                    push(1 if test(pop(), arg2) else 0)
+                    return nxt
+                return handler
+            calc = self._arithmetic[arg1]
+
+            def handler():
+                push(calc(pop(), arg2))
+                return nxt
+            return handler
+
+        # 9: jcs
+        def jcs(nxt, arg1, arg2):
+            test = self._comparison[arg1]
+
+            def handler():
+                a = pop()
+                if test(pop(), a):
+                    return nxt
+                return arg2
+            return handler
+
+        # 10: jcv
+        def jcv(nxt, arg1, arg2, arg3, arg4):
+            test = self._comparison[arg1]
+            local_a, offset_a = var_offset(arg3)
+            local_b, offset_b = var_offset(arg4)
+            if local_a and local_b:
+                def handler():
+                    if test(var_stack[frame_pointer + offset_a], var_stack[frame_pointer + offset_b]):
+                        return nxt
+                    return arg2
+                return handler
+
+            def handler():
+                a = var_stack[frame_pointer + offset_a if local_a else offset_a]
+                if test(a, var_stack[frame_pointer + offset_b if local_b else offset_b]):
+                    return nxt
+                return arg2
+            return handler
+
+        # 11: jcl
+        def jcl(nxt, arg1, arg2, arg3, arg4):
+            test = self._comparison[arg1]
+            local, offset = var_offset(arg3)
+            if local:
+                def handler():
+                    if test(var_stack[frame_pointer + offset], arg4):
+                        return nxt
+                    return arg2
+                return handler
+
+            def handler():
+                if test(var_stack[offset], arg4):
+                    return nxt
+                return arg2
+            return handler
+
+        instructions = [lit, lod, sto, cal, jmp, jpc, opr, inc, opl, jcs, jcv, jcl, tcl]
+        handlers = [None] * len(self._instructionTable)
+        decoded = {}
+        for address, ins in self._instructionTable:
+            handlers[address] = instructions[ins[0]](address + len(ins), *ins[1:])
+            if trace:
+                decoded[address] = ins
+        return handlers
@@ -0,0 +1,113 @@
+"""
+Instruction fusion module.
+"""
+from instruction_table import InstructionTable
+
+
+class InstructionFuser:
+    """
+    Rewrite common instruction sequences of a complete instruction table into superinstructions:
+
+    lod x; lit c; opr 2(1); str x       ->  inc x (-)c          x = x + c
+    lod a; lod b; opr k; jpc 0(1) L     ->  jcv k(!k) L a b     jump to L unless a k b
+    lod a; lit c; opr k; jpc 0(1) L     ->  jcl k(!k) L a c     jump to L unless a k c
+    opr k; jpc 0(1) L                   ->  jcs k(!k) L         jump to L unless second k top
+    lit c; opr k                        ->  opl k c             top = top k c
+
+    Here 'k' is the operation code of a comparison and '!k' the opposite comparison.
+    A sequence is never fused if anything but its first instruction could be jumped to.
+    """
+    _lit = InstructionTable.code('lit')
+    _lod = InstructionTable.code('lod')
+    _str = InstructionTable.code('str')
+    _jpc = InstructionTable.code('jpc')
+    _opr = InstructionTable.code('opr')
+
+    # Comparison operation codes and their opposites.
+    _negation = {3: 6, 4: 5, 5: 4, 6: 3, 7: 8, 8: 7}
+
+    # Operation codes taking two values from data stack.
+    _binary = {1, 2, 3, 4, 5, 6, 7, 8, 10, 11, 12, 13, 16}
+
+    def __init__(self, it):
+        self._it = it
+        self._rules = [
+            (4, self._inc), (4, self._jcv), (4, self._jcl),
+            (2, self._jcs), (2, self._opl)
+        ]
+
+    def fuse(self):
+        """ Fuse the instruction table. Return the number of instructions eliminated. """
+        table = self._it.table
+        targets = self._it.targets()
+        fused = []
+        idx = 0
+        while idx < len(table):
+            for length, rule in self._rules:
+                if idx + length > len(table) or any(i in targets for i in range(idx + 1, idx + length)):
+                    continue
+                ins = rule(table[idx:idx + length])
+                if ins is not None:
+                    fused.append((idx, ins))
+                    idx += length
+                    break
+            else:
+                fused.append((idx, table[idx]))
+                idx += 1
+        eliminated = len(table) - len(fused)
+        self._it.rewrite(fused)
+        return eliminated
+
+    # Compare and jump. Jump if comparison fails, like 'jpc 0'.
+    def _condition(self, opr_ins, jpc_ins):
+        if opr_ins[0] != self._opr or opr_ins[1] not in self._negation or jpc_ins[0] != self._jpc:
+            return None
+        if jpc_ins[1] == 0:
+            return opr_ins[1]
+        if jpc_ins[1] == 1:
+            return self._negation[opr_ins[1]]
+        return None
+
+    # x = x + c
+    def _inc(self, seq):
+        lod_ins, lit_ins, opr_ins, str_ins = seq
+        if lod_ins[0] != self._lod or lit_ins[0] != self._lit or opr_ins[0] != self._opr \
+                or str_ins[0] != self._str or lod_ins[1] != str_ins[1] or str_ins[1] == -1:
+            return None
+        if opr_ins[1] == 2:
+            return [InstructionTable.code('inc'), str_ins[1], lit_ins[2]]
+        if opr_ins[1] == 1:
+            return [InstructionTable.code('inc'), str_ins[1], -lit_ins[2]]
+        return None
+
+    # Compare two variables and jump.
+    def _jcv(self, seq):
+        if seq[0][0] != self._lod or seq[1][0] != self._lod:
+            return None
+        cmp = self._condition(seq[2], seq[3])
+        if cmp is None:
+            return None
+        return [InstructionTable.code('jcv'), cmp, seq[3][2], seq[0][1], seq[1][1]]
+
+    # Compare a variable with a number and jump.
+    def _jcl(self, seq):
+        if seq[0][0] != self._lod or seq[1][0] != self._lit:
+            return None
+        cmp = self._condition(seq[2], seq[3])
+        if cmp is None:
+            return None
+        return [InstructionTable.code('jcl'), cmp, seq[3][2], seq[0][1], seq[1][2]]
+
+    # Compare two values on data stack and jump.
+    def _jcs(self, seq):
+        cmp = self._condition(seq[0], seq[1])
+        if cmp is None:
+            return None
+        return [InstructionTable.code('jcs'), cmp, seq[1][2]]
+
+    # Operate with a number.
+    def _opl(self, seq):
+        lit_ins, opr_ins = seq
+        if lit_ins[0] != self._lit or opr_ins[0] != self._opr or opr_ins[1] not in self._binary:
+            return None
+        return [InstructionTable.code('opl'), opr_ins[1], lit_ins[2]]
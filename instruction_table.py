@@ -1,14 +1,26 @@
 import os
 from executor import Executor
+from packed_table import PackedTable
 
 
 class InstructionTable:
     _instruction_code = {
         'lit': 0, 'lod': 1, 'str': 2, 'cal': 3,
         'jmp': 4, 'jpc': 5, 'opr': 6,
+        # Superinstructions, generated by instruction fusion.
+        'inc': 7, 'opl': 8, 'jcs': 9, 'jcv': 10, 'jcl': 11,
+        # Tail call, generated for a call right before returning.
+        'tcl': 12,
 
         0: 'lit', 1: 'lod', 2: 'str', 3: 'cal',
-        4: 'jmp', 5: 'jpc', 6: 'opr'
+        4: 'jmp', 5: 'jpc', 6: 'opr',
+        7: 'inc', 8: 'opl', 9: 'jcs', 10: 'jcv', 11: 'jcl',
+        12: 'tcl'
+    }
+
+    # Fields of an instruction holding an instruction index, keyed by instruction code.
+    _target_fields = {
+        3: (1, 2), 4: (2,), 5: (2,), 9: (2,), 10: (2,), 11: (2,), 12: (1,)
     }
 
     @property
@@ -19,19 +31,124 @@ class InstructionTable:
     def next_line_num(self):
         return self._curLineNum
 
+    @property
+    def functions(self):
+        return self._functions
+
     def __init__(self):
         self._table = []
         self._curLineNum = 0
+        # Entrance instruction index of functions -> [function name, number of parameters, return void or not]
+        self._functions = {}
+
+    @classmethod
+    def code(cls, ic):
+        """ Get the instruction code of an instruction name. """
+        if not isinstance(ic, str) or ic not in cls._instruction_code:
+            raise Exception('Instruction code error.')
+        return cls._instruction_code[ic]
 
     # Set 'ins' as a return value so that missing value in 'ins' can be filled later.
     def gen(self, ic, arg1, arg2):
-        if ic not in ['lit', 'lod', 'str', 'cal', 'ini', 'jmp', 'jpc', 'opr']:
-            raise Exception('Instruction code error.')
-        ins = [self._instruction_code[ic], arg1, arg2]
+        ins = [self.code(ic), arg1, arg2]
         self._table.append(ins)
         self._curLineNum += 1
         return ins
 
+    def truncate(self, length):
+        """ Drop instructions from index 'length' on, to generate them again in another way. """
+        del self._table[length:]
+        self._curLineNum = len(self._table)
+
+    def add_func(self, name, param_num, return_void):
+        """ Record a function starting at next instruction. """
+        self._functions[self._curLineNum] = [name, param_num, return_void]
+
+    def append_code(self, code, entry, calls):
+        """
+        Append instructions of a function taken from another table, where it started at instruction 'entry'.
+        Jump targets and return addresses move along with the function.
+        calls: index in 'code' of every 'cal' or 'tcl' -> entrance of the function called in this table.
+        """
+        offset = self._curLineNum - entry
+        start = len(self._table)
+        self._table.extend([list(ins) for ins in code])
+        for ins in self._table[start:]:
+            if ins[0] in self._target_fields:
+                for field in self._target_fields[ins[0]]:
+                    ins[field] += offset
+        for idx, callee_entry in calls.items():
+            self._table[start + idx][1] = callee_entry
+        self._curLineNum = len(self._table)
+
+    def targets(self):
+        """ Get the set of instruction indexes which could be jumped to, called or returned to. """
+        res = set()
+        for ins in self._table:
+            for field in self._target_fields.get(ins[0], ()):
+                res.add(ins[field])
+        return res
+
+    def load(self, table, functions):
+        """ Replace the whole table and functions with ones kept before, like by DiskCache. """
+        self._table = table
+        self._curLineNum = len(table)
+        self._functions = functions
+
+    def rewrite(self, instructions):
+        """
+        Replace the whole table after instructions being removed or merged.
+        instructions: list of (old instruction index, new instruction) in order.
+        Targets pointing to a removed instruction move to the first instruction kept after it.
+        Functions whose entrance is removed are dropped.
+        """
+        new_idx = [0] * (len(self._table) + 1)
+        last = 0
+        for cnt, (old_idx, ins) in enumerate(instructions):
+            while last <= old_idx:
+                new_idx[last] = cnt
+                last += 1
+        while last <= len(self._table):
+            new_idx[last] = len(instructions)
+            last += 1
+        self._table = []
+        for old_idx, ins in instructions:
+            for field in self._target_fields.get(ins[0], ()):
+                if ins[field] is not None:
+                    ins[field] = new_idx[ins[field]]
+            self._table.append(ins)
+        self._curLineNum = len(self._table)
+        kept = {old_idx for old_idx, ins in instructions}
+        self._functions = {new_idx[entry]: info for entry, info in self._functions.items() if entry in kept}
+
+    def pack(self):
+        """
+        Pack the finished table into a PackedTable.
+        Instruction indexes in jump and call targets are turned into addresses in packed code.
+        """
+        address = [0]
+        for ins in self._table:
+            address.append(address[-1] + len(ins))
+        packed = PackedTable()
+        # Index of a value in constant pool. Type is a part of the key so that 1 and 1.0 are kept apart.
+        const_idx = {}
+        for ins in self._table:
+            if len(ins) != PackedTable.widths[ins[0]]:
+                raise Exception('Instruction width error.')
+            fields = list(ins)
+            for field in self._target_fields.get(ins[0], ()):
+                fields[field] = address[fields[field]]
+            for field in PackedTable.value_fields.get(ins[0], ()):
+                key = (type(fields[field]), fields[field])
+                if key not in const_idx:
+                    const_idx[key] = len(packed.consts)
+                    packed.consts.append(fields[field])
+                fields[field] = const_idx[key]
+            packed.code.extend(fields)
+        for entry, info in self._functions.items():
+            packed.functions[address[entry]] = list(info)
+        return packed
+
     # Used when debugging. Print current instruction table.
     def print_ins_table(self, to_screen=False, file_name='instruction code.txt'):
         line_num = 0
@@ -40,14 +157,45 @@ class InstructionTable:
             os.mkdir(dir_name)
         output_file = open(dir_name + '\\' + file_name, 'w')
         for ins in self._table:
-            line = self._instruction_code[ins[0]] + '\t' + str(ins[1]) + '\t' + str(ins[2])
+            line = self._instruction_code[ins[0]] + '\t' + '\t'.join(str(arg) for arg in ins[1:])
             output_file.write(line + '\n')
             if to_screen:
                 print(str(line_num) + '\t' + line)
                 line_num += 1
         output_file.close()
 
-    # Execute instructions in the table.
-    def execute(self):
-        executor = Executor(self._table)
+    # Used when profiling. Print instruction counts next to the instruction table, followed by counts of each
+    # instruction and operation code and time spent in each function.
+    def print_profile(self, profile, to_screen=False, file_name='profile.txt'):
+        dir_name = 'instruction table'
+        if not os.path.isdir(dir_name):
+            os.mkdir(dir_name)
+        lines = ['count\tline\tinstruction']
+        for line_num, count in enumerate(profile.instruction_counts()):
+            ins = self._table[line_num]
+            lines.append(str(count) + '\t' + str(line_num) + '\t' + self._instruction_code[ins[0]] + '\t'
+                         + '\t'.join(str(arg) for arg in ins[1:]))
+        lines.append('')
+        lines.append('count\tinstruction')
+        for key, count in sorted(profile.operation_counts().items(), key=lambda item: -item[1]):
+            name = self._instruction_code[key[0]] + ('' if key[1] is None else '\t' + str(key[1]))
+            lines.append(str(count) + '\t' + name)
+        lines.append('')
+        lines.append('calls\tinclusive\texclusive\tfunction')
+        for entry, (calls, inclusive, exclusive) in sorted(profile.functions.items(), key=lambda item: -item[1][1]):
+            lines.append(str(calls) + '\t' + '%.6f' % inclusive + '\t' + '%.6f' % exclusive + '\t'
+                         + profile.packed.functions[entry][0])
+        lines.append('total\t' + '%.6f' % profile.time)
+        output_file = open(dir_name + '\\' + file_name, 'w')
+        for line in lines:
+            output_file.write(line + '\n')
+            if to_screen:
+                print(line)
+        output_file.close()
+
+    # Execute instructions in the table with the given engine and I/O. Print the profile if profiling.
+    def execute(self, engine='switch', io=None, profile=False):
+        executor = Executor(self.pack(), engine, io, profile)
         executor.execute()
+        if profile:
+            self.print_profile(executor.profile, True)
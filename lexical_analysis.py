@@ -1,6 +1,8 @@
 """
 Lexical analysis module.
 """
+import re
+import mmap
 from map_info import MapInfo
 
 
@@ -10,6 +12,8 @@ class LexicalAnalyst:
         'if', 'elif', 'else', 'XOR', 'ODD', 'until', 'const', 'repeat', 'for',
         'do', 'while', 'read', 'write', 'int', 'void', 'func', 'return'
     ]
+    # Preserved word -> symbol type.
+    _keywords = dict(zip(_preserved, map(MapInfo.mmap.get, _preserved)))
 
     @property
     def cur_num(self):
@@ -33,7 +37,9 @@ class LexicalAnalyst:
 
         # character cache.
         self._cur_line_num = 0
-        self.cur_line = []
+        self.cur_line = ''
+        # Index of the next char in current line.
+        self._col = 0
         self._cur_num = 0
         self.cur_char = ' '
         self._cur_sym = None
@@ -43,12 +49,13 @@ class LexicalAnalyst:
     # Read single line of code from source file.
     def _readline(self):
         self._cur_line_num += 1
-        return list(self.src.readline())[::-1]
+        self._col = 0
+        return self.src.readline()
 
     # Read single char from line.
     # Flush: to skip a line before reading or not.
     def _getch(self, flush=False):
-        if self.cur_line == [] or flush:
+        if self._col == len(self.cur_line) or flush:
             self.cur_line = self._readline()
             # EOF.
             if not self.cur_line:
@@ -56,18 +63,47 @@ class LexicalAnalyst:
                 self.cur_char = None
                 return
 
-        self.cur_char = self.cur_line.pop()
+        self.cur_char = self.cur_line[self._col]
+        self._col += 1
+
+    # Skip over a multiple line comment after its '/*', up to the char after '*/' or end of file.
+    def _skip_comment(self):
+        while True:
+            end = self.cur_line.find('*/', self._col)
+            if end != -1:
+                self._col = end + 2
+                self._getch()
+                return
+            self.cur_line = self._readline()
+            if not self.cur_line:
+                self.eof = True
+                self.cur_char = None
+                return
 
     # Get a symbol.
     def getsym(self):
-        if self.eof:
-            self._cur_sym = None
-            self._sym_type = MapInfo.mmap[self._cur_sym]
-            return
-
-        # Skip over empty symbols. Return if meet end of file.
-        while not self.eof and (self.cur_char == ' ' or self.cur_char == '\t' or self.cur_char == '\n'):
+        # Skip over empty symbols and comments. Return if meet end of file.
+        while True:
+            while not self.eof and (self.cur_char == ' ' or self.cur_char == '\t' or self.cur_char == '\n'):
+                self._getch()
+            if self.eof:
+                self._cur_sym = None
+                self._sym_type = MapInfo.mmap[self._cur_sym]
+                return
+            if self.cur_char != '/':
+                break
             self._getch()
+            # Jump over single line comment.
+            if self.cur_char == '/':
+                self._getch(True)
+            # Jump over multiple line comment.
+            elif self.cur_char == '*':
+                self._skip_comment()
+            # Single symbol '/'
+            else:
+                self._cur_sym = '/'
+                self._sym_type = MapInfo.mmap[MapInfo.ssym['/']]
+                return
 
         # Current char is an integer.
         if self.cur_char.isdigit():
@@ -84,39 +120,12 @@ class LexicalAnalyst:
                 self._cur_sym += self.cur_char
                 self._getch()
             # Find and judge if _cur_sym is a preserved word.
-            if self._cur_sym in self._preserved:
-                self._sym_type = MapInfo.mmap[self._cur_sym]
-            else:
-                self._sym_type = MapInfo.mmap['ident']
+            self._sym_type = self._keywords.get(self._cur_sym, MapInfo.mmap['ident'])
 
         # Current char is a symbol like ';' or '*' and so on.
         else:
-            # Comments.
-            if self.cur_char == '/':
-                self._getch()
-                # Jump over single line comment and get symbol again.
-                if self.cur_char == '/':
-                    self._getch(True)
-                    self.getsym()
-                # Jump over multiple line comment and get symbol again.
-                elif self.cur_char == '*':
-                    self._getch()
-                    l = self.cur_char
-                    while True:
-                        f = l
-                        self._getch()
-                        l = self.cur_char
-                        if f == '*' and l == '/':
-                            break
-                    self._getch()
-                    self.getsym()
-                # Single symbol '/'
-                else:
-                    self._cur_sym = '/'
-                    self._sym_type = MapInfo.mmap[MapInfo.ssym['/']]
-
             # Equal or to judge if equal.
-            elif self.cur_char == '=':
+            if self.cur_char == '=':
                 self._getch()
                 # Next char is '=' so that we get '=='
                 if self.cur_char == '=':
@@ -203,3 +212,257 @@ class LexicalAnalyst:
     # Used when finish reading the file.
     def close_input(self):
         self.src.close()
+
+
+class RegexLexicalAnalyst(LexicalAnalyst):
+    """
+    Lexical analyst giving the same symbols as LexicalAnalyst, but reading the whole source file at once and
+    splitting it into tokens with one regular expression.
+    Tokens are kept as (symbol type, symbol or number, line number). A '!' not followed by '=' gives a token of type
+    None, which changes no symbol, like in LexicalAnalyst.
+    """
+    # Comments, replaced by a space and the line breaks in them before splitting tokens.
+    _comment = re.compile(r"//[^\n]*|/\*(?:.*?\*/|.*)", re.DOTALL)
+    # Tokens and line breaks.
+    _token = re.compile(r"\w+|[=!<>]=|\+\+|--|[^ \t]")
+    _word_part = re.compile(r"\d+|_|[^\W\d_]\w*")
+
+    _number = MapInfo.mmap['number']
+
+    # Symbol type of each symbol and preserved word.
+    _sym_types = dict(
+        [(sym, MapInfo.mmap[name]) for sym, name in MapInfo.ssym.items()]
+        + [('==', MapInfo.mmap['ifEqual']), ('!=', MapInfo.mmap['unEqual']), ('>=', MapInfo.mmap['lgEqual']),
+           ('<=', MapInfo.mmap['slEqual']), ('++', MapInfo.mmap['selfPls']), ('--', MapInfo.mmap['selfMin']),
+           ('!', None)]
+        + list(LexicalAnalyst._keywords.items())
+    )
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        self._tokens = self._tokenize(self.src.read())
+        self._next_token = 0
+
+    def _tokenize(self, text):
+        tokens = []
+        if '/' in text:
+            text = self._comment.sub(lambda match: ' ' + '\n' * match.group().count('\n'), text)
+        # Symbol types of symbols, preserved words and identifiers met.
+        self._split(text, 1, dict(self._sym_types), tokens.append)
+        return tokens
+
+    # Split text without comments into tokens given to 'append'. Return the line number at the end of text.
+    def _split(self, text, line_num, sym_types, append):
+        number = MapInfo.mmap['number']
+        ident = MapInfo.mmap['ident']
+        unknown = MapInfo.mmap['unknown']
+        for token in self._token.findall(text):
+            if token in sym_types:
+                append((sym_types[token], token, line_num))
+            elif token == '\n':
+                line_num += 1
+            elif token[0].isalpha():
+                sym_types[token] = ident
+                append((ident, token, line_num))
+            elif token.isdigit():
+                append((number, int(token), line_num))
+            elif token[0] in '_0123456789':
+                # Like LexicalAnalyst, a word starting with digits or '_' is split into numbers, unknown '_' and an
+                # identifier or preserved word.
+                for part in self._word_part.findall(token):
+                    if part.isdigit():
+                        append((number, int(part), line_num))
+                    elif part == '_':
+                        append((unknown, None, line_num))
+                    else:
+                        append((sym_types.get(part, ident), part, line_num))
+            else:
+                append((unknown, None, line_num))
+        return line_num
+
+    # Get a symbol.
+    def getsym(self):
+        if self._next_token == len(self._tokens):
+            self.eof = True
+            self._cur_sym = None
+            self._sym_type = MapInfo.mmap[self._cur_sym]
+            return
+        sym_type, val, self._cur_line_num = self._tokens[self._next_token]
+        self._next_token += 1
+        if sym_type is None:
+            return
+        self._sym_type = sym_type
+        if sym_type == self._number:
+            self._cur_num = val
+        elif val is not None:
+            self._cur_sym = val
+
+
+class LineCachedLexicalAnalyst(RegexLexicalAnalyst):
+    """
+    Lexical analyst giving the same symbols as RegexLexicalAnalyst, splitting the source file a line at a time.
+    Tokens of every line are kept in 'cache', keyed by the line and whether it starts inside a multiple line comment,
+    so that an analyst given the cache of an earlier analyst only splits the lines changed since. Lines no longer in
+    the file are dropped from the cache.
+    """
+    # Comments in a line. Group 1 is not None for a multiple line comment going on to the next line.
+    _line_comment = re.compile(r"//.*|/\*(?:.*?\*/|(.*))")
+
+    def __init__(self, filename, cache=None):
+        self._cache = {} if cache is None else cache
+        super().__init__(filename)
+
+    def _tokenize(self, text):
+        tokens = []
+        cache = {}
+        sym_types = dict(self._sym_types)
+        in_comment = False
+        for line_num, line in enumerate(text.split('\n'), 1):
+            key = (line, in_comment)
+            if key in self._cache:
+                line_tokens, in_comment = self._cache[key]
+            else:
+                line_tokens, in_comment = self._split_line(line, in_comment, sym_types)
+            cache[key] = (line_tokens, in_comment)
+            tokens.extend([(sym_type, val, line_num) for sym_type, val in line_tokens])
+        self._cache.clear()
+        self._cache.update(cache)
+        return tokens
+
+    # Split a line into (symbol type, symbol or number). Also tell if the line ends inside a multiple line comment.
+    def _split_line(self, line, in_comment, sym_types):
+        if in_comment:
+            end = line.find('*/')
+            if end == -1:
+                return (), True
+            line = ' ' + line[end + 2:]
+        in_comment = False
+        if '/' in line:
+            pieces = []
+            last = 0
+            for match in self._line_comment.finditer(line):
+                pieces.append(line[last:match.start()])
+                in_comment = match.group(1) is not None
+                last = match.end()
+            pieces.append(line[last:])
+            line = ' '.join(pieces)
+        line_tokens = []
+        self._split(line, 0, sym_types, line_tokens.append)
+        return tuple((sym_type, val) for sym_type, val, line_num in line_tokens), in_comment
+
+
+class MappedLexicalAnalyst(LexicalAnalyst):
+    """
+    Lexical analyst giving the same symbols as LexicalAnalyst, scanning a memory map of the source file.
+    Tokens are (symbol type, start, end) offsets into the map, found one at a time, so that memory used does not
+    grow with the file. Identifiers and numbers are only decoded when 'cur_sym' or 'cur_num' is read, and line
+    numbers only counted when 'line_num' is read.
+    The source file is read as bytes, so identifiers are ASCII letters, digits and '_'.
+    """
+    # White space and comments before a token, and the token. Like a file opened as text, '\r' breaks lines.
+    # White space and comments are matched as a whole in a lookahead, so that no part of them is taken back as a
+    # token. At the end of file there is no token.
+    _token = re.compile(rb"(?=((?:[ \t\r\n]+|//[^\r\n]*|/\*(?:.*?\*/|.*))*))\1(?:(\w+|[=!<>]=|\+\+|--|.)|\Z)",
+                        re.DOTALL)
+    _word_part = re.compile(rb"\d+|_|[^\W\d_]\w*")
+
+    _number = MapInfo.mmap['number']
+    _ident = MapInfo.mmap['ident']
+    _unknown = MapInfo.mmap['unknown']
+
+    # Symbol type of each symbol and preserved word, and symbol of each symbol type.
+    _symbols = {sym.encode(): sym_type for sym, sym_type in RegexLexicalAnalyst._sym_types.items()}
+    _sym_texts = {sym_type: sym for sym, sym_type in RegexLexicalAnalyst._sym_types.items()}
+
+    @property
+    def cur_num(self):
+        if self._num_span is not None:
+            self._cur_num = int(self._map[self._num_span[0]:self._num_span[1]])
+            self._num_span = None
+        return self._cur_num
+
+    @property
+    def cur_sym(self):
+        if self._sym_span is not None:
+            self._cur_sym = self._map[self._sym_span[0]:self._sym_span[1]].decode()
+            self._sym_span = None
+        return self._cur_sym
+
+    @property
+    def line_num(self):
+        if self._line_pos < self._token_start:
+            self._cur_line_num += self._map[self._line_pos:self._token_start].count(b'\n')
+            self._line_pos = self._token_start
+        return self._cur_line_num
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        self._cur_line_num = 1
+        self._line_pos = 0
+        self._token_start = 0
+        self._num_span = None
+        self._sym_span = None
+        if self.src.seek(0, 2) == 0:
+            # Empty files can not be mapped.
+            self._map = None
+            self._tokens = iter(())
+        else:
+            self._map = mmap.mmap(self.src.fileno(), 0, access=mmap.ACCESS_READ)
+            self._tokens = self._tokenize()
+
+    def _tokenize(self):
+        symbols = self._symbols
+        for match in self._token.finditer(self._map):
+            start, end = match.span(2)
+            token = match.group(2)
+            if token is None:
+                return
+            if token in symbols:
+                yield symbols[token], start, end
+            elif token[0] in b'_0123456789':
+                for part in self._word_part.finditer(token):
+                    part_start, part_end = start + part.start(), start + part.end()
+                    if part.group().isdigit():
+                        yield self._number, part_start, part_end
+                    elif part.group() == b'_':
+                        yield self._unknown, part_start, part_end
+                    elif part.group() in symbols:
+                        yield symbols[part.group()], part_start, part_end
+                    else:
+                        yield self._ident, part_start, part_end
+            elif token[:1].isalpha():
+                yield self._ident, start, end
+            else:
+                yield self._unknown, start, end
+
+    # Get a symbol.
+    def getsym(self):
+        token = next(self._tokens, None)
+        if token is None:
+            self.eof = True
+            self._sym_span = None
+            self._cur_sym = None
+            self._sym_type = MapInfo.mmap[self._cur_sym]
+            return
+        sym_type, start, end = token
+        self._token_start = start
+        if sym_type is None:
+            return
+        self._sym_type = sym_type
+        if sym_type == self._number:
+            self._num_span = (start, end)
+        elif sym_type == self._ident:
+            self._sym_span = (start, end)
+        elif sym_type != self._unknown:
+            self._sym_span = None
+            self._cur_sym = self._sym_texts[sym_type]
+
+    # Used when finish reading the file.
+    def close_input(self):
+        self._tokens = None
+        if self._map is not None:
+            # Decode the last symbol before the map is gone.
+            self.cur_sym
+            self.cur_num
+            self._map.close()
+        self.src.close()
@@ -1,6 +1,11 @@
 import os
-import sys
+import time
+import argparse
+from executor import Executor
+from program_io import BufferedIO
 from syntax_analysis import SyntaxAnalyst
+from compile_cache import CompileCache
+from disk_cache import DiskCache
 
 
 # search all files under this directory.
@@ -18,12 +23,59 @@ def _getfile(file_name):
                 return os.path.abspath(name)
     return None
 
+parser = argparse.ArgumentParser(description='Compile and run a small-C source file.')
+parser.add_argument('file', nargs='?', help='name of the source file, searched under current directory')
+parser.add_argument('--engine', choices=Executor.engines, default='switch', help='execution engine')
+parser.add_argument('--lexer', choices=SyntaxAnalyst.lexers, default='char', help='lexical analyst')
+parser.add_argument('--backend', choices=SyntaxAnalyst.backends, default='stack',
+                    help='generate code for the stack machine, or for the register machine')
+parser.add_argument('--fuse', action='store_true', help='fuse common instruction sequences into superinstructions')
+parser.add_argument('--no-peephole', action='store_true',
+                    help='keep jumps to jumps and instructions never run, instead of optimizing them away')
+parser.add_argument('--inline-budget', type=int, default=24,
+                    help='most syntax tree nodes in the body of a function inlined, 0 to inline nothing')
+parser.add_argument('--buffered', action='store_true',
+                    help='read all input at once and buffer output, instead of a line at a time')
+parser.add_argument('--input', help='read program input from this file, implies --buffered')
+parser.add_argument('--output', help='write program output to this file, implies --buffered')
+parser.add_argument('--profile', action='store_true',
+                    help='count instructions and time functions, then print the profile')
+parser.add_argument('--watch', action='store_true',
+                    help='compile and run again whenever the source file changes, analysing only what changed')
+parser.add_argument('--no-disk-cache', action='store_true',
+                    help='always compile, instead of loading the table compiled before from the disk cache')
+parser.add_argument('--disk-cache-size', type=int, default=16,
+                    help='most megabytes kept in the disk cache, removing least recently used tables beyond it')
+args = parser.parse_args()
+if args.backend == 'register' and (args.fuse or args.watch or args.profile or args.engine != 'switch'):
+    parser.error('--backend register can not be used with --fuse, --watch, --profile or --engine')
+
 # filename = 'sample_code0'
-if len(sys.argv) > 1:
-    filename = _getfile(sys.argv[1])
+if args.file is not None:
+    filename = _getfile(args.file)
 else:
     filename = _getfile(input('Input file name:\n'))
 assert (filename is not None)
 print(os.getcwd())
-sa = SyntaxAnalyst(filename)
-sa.execute()
+cache = CompileCache() if args.watch else None
+# Incremental analysis of --watch keeps its own cache in memory.
+disk_cache = None if args.watch or args.no_disk_cache else DiskCache(max_bytes=args.disk_cache_size * 1024 * 1024)
+while True:
+    mtime = os.path.getmtime(filename)
+    try:
+        sa = SyntaxAnalyst(filename, args.fuse, args.lexer, cache, not args.no_peephole, args.backend,
+                           args.inline_budget, disk_cache)
+        if args.buffered or args.input is not None or args.output is not None:
+            sa.execute(args.engine, BufferedIO(args.input, args.output), args.profile)
+        else:
+            sa.execute(args.engine, profile=args.profile)
+    except Exception as e:
+        if not args.watch:
+            raise
+        print(type(e).__name__ + ': ' + str(e))
+    if not args.watch:
+        break
+    print('Functions reused: ' + str(cache.reused) + ', analysed: ' + str(cache.analysed) + '.')
+    print('Waiting for changes of ' + filename + '...')
+    while os.path.getmtime(filename) == mtime:
+        time.sleep(0.5)
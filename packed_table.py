@@ -0,0 +1,47 @@
+"""
+Packed instruction table module.
+"""
+from array import array
+
+
+class PackedTable:
+    """
+    A finished program packed into one typed array.
+
+    Instructions are laid out one after another as 'instruction code, arguments...', so that the address of an
+    instruction is its offset in 'code' and jump or call targets are addresses too. Instructions of the same code
+    always have the same width.
+    Numbers used as values (not as addresses, offsets or operation codes) are kept in a constant pool and the
+    instruction holds their index, so that every field fits into a 64-bit integer.
+    Functions are kept as: entrance address -> [function name, number of parameters, return void or not].
+    """
+    # Fields holding a value, keyed by instruction code.
+    value_fields = {
+        0: (2,), 7: (2,), 8: (2,), 11: (4,)
+    }
+
+    # Instruction width, keyed by instruction code.
+    widths = {
+        0: 3, 1: 3, 2: 3, 3: 3, 4: 3, 5: 3, 6: 3,
+        7: 3, 8: 3, 9: 3, 10: 5, 11: 5, 12: 3
+    }
+
+    def __init__(self, code=None, consts=None, functions=None):
+        self.code = array('q') if code is None else code
+        self.consts = [] if consts is None else consts
+        self.functions = {} if functions is None else functions
+
+    def __len__(self):
+        return len(self.code)
+
+    def __iter__(self):
+        """ Iterate over (address, instruction) with values taken back from constant pool. """
+        code = self.code
+        address = 0
+        while address < len(code):
+            width = self.widths[code[address]]
+            ins = list(code[address:address + width])
+            for field in self.value_fields.get(ins[0], ()):
+                ins[field] = self.consts[ins[field]]
+            yield address, ins
+            address += width
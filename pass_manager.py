@@ -0,0 +1,36 @@
+"""
+Pass manager module.
+"""
+import time
+
+
+class PassManager:
+    """
+    Passes run on a syntax tree between analysis and code generation, in the order they are registered.
+    A pass is a callable taking a Program and returning the Program to go on with, which may be the same one changed.
+    Seconds spent by each pass in the last run are kept in 'times', by name.
+    """
+    def __init__(self):
+        self._passes = []
+        self.times = {}
+
+    def register(self, name, tree_pass):
+        """ Add a pass after the passes registered before. """
+        if any(name == registered for registered, p in self._passes):
+            raise Exception('Pass \'' + name + '\' already registered.')
+        self._passes.append((name, tree_pass))
+
+    def unregister(self, name):
+        self._passes = [(registered, p) for registered, p in self._passes if registered != name]
+
+    @property
+    def names(self):
+        return [name for name, p in self._passes]
+
+    def run(self, program):
+        self.times = {}
+        for name, tree_pass in self._passes:
+            start = time.perf_counter()
+            program = tree_pass(program)
+            self.times[name] = time.perf_counter() - start
+        return program
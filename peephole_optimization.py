@@ -0,0 +1,91 @@
+"""
+Peephole optimization module.
+"""
+from instruction_table import InstructionTable
+
+
+class PeepholeOptimizer:
+    """
+    Clean up a complete instruction table, before instruction fusion:
+
+    jmp L; ... L: jmp M             ->  jmp M; ... L: jmp M         jumps to a jump go to its target at once
+    jpc c L; ... L: jmp M           ->  jpc c M; ... L: jmp M
+    jmp L; ... L: opr 0             ->  opr 0; ... L: opr 0         jumping to a return returns at once
+    jmp L; L: ...                   ->  L: ...                      jumps to next instruction are removed
+    opr -1 n; opr 0                 ->  opr 0                       returning drops the whole frame anyway
+
+    Instructions which can never be run, like those after a return or functions never called, are removed.
+    Targets of the instructions left are moved to where the instructions they pointed to went.
+    """
+    _cal = InstructionTable.code('cal')
+    _tcl = InstructionTable.code('tcl')
+    _jmp = InstructionTable.code('jmp')
+    _jpc = InstructionTable.code('jpc')
+    _opr = InstructionTable.code('opr')
+
+    def __init__(self, it):
+        self._it = it
+
+    def optimize(self):
+        """ Optimize the instruction table. Return the number of instructions removed. """
+        table = self._it.table
+        self._thread(table)
+        reachable = self._reachable(table)
+        # Walk backwards, so that whatever follows an instruction is final when it is looked at.
+        # first_kept[i]: index of the first instruction kept from i on.
+        first_kept = [len(table)] * (len(table) + 1)
+        for idx in range(len(table) - 1, -1, -1):
+            ins = table[idx]
+            nxt = first_kept[idx + 1]
+            if not reachable[idx] or idx not in self._it.functions and (
+                    ins[0] == self._jmp and idx < ins[2] and first_kept[ins[2]] == nxt
+                    or ins[0] == self._opr and ins[1] == -1 and nxt < len(table) and self._is_return(table[nxt])):
+                first_kept[idx] = nxt
+            else:
+                first_kept[idx] = idx
+        kept = [(idx, ins) for idx, ins in enumerate(table) if first_kept[idx] == idx]
+        removed = len(table) - len(kept)
+        self._it.rewrite(kept)
+        return removed
+
+    def _is_return(self, ins):
+        return ins[0] == self._opr and ins[1] == 0
+
+    # Point jumps past jumps, and turn jumps to a return into returns.
+    def _thread(self, table):
+        for idx, ins in enumerate(table):
+            if ins[0] != self._jmp and ins[0] != self._jpc:
+                continue
+            target = ins[2]
+            seen = {idx}
+            while target < len(table) and table[target][0] == self._jmp and target not in seen:
+                seen.add(target)
+                target = table[target][2]
+            # A loop of jumps never ends, and is left as it is.
+            if target in seen:
+                continue
+            ins[2] = target
+            if ins[0] == self._jmp and target < len(table) and self._is_return(table[target]):
+                table[idx] = list(table[target])
+
+    # Tell if each instruction can be run, starting from the first one.
+    def _reachable(self, table):
+        reachable = [False] * len(table)
+        todo = [0]
+        while todo:
+            idx = todo.pop()
+            if idx >= len(table) or reachable[idx]:
+                continue
+            reachable[idx] = True
+            ins = table[idx]
+            if ins[0] == self._jmp:
+                todo.append(ins[2])
+            elif ins[0] == self._jpc:
+                todo.extend((ins[2], idx + 1))
+            elif ins[0] == self._cal:
+                todo.extend((ins[1], ins[2]))
+            elif ins[0] == self._tcl:
+                todo.append(ins[1])
+            elif not self._is_return(ins):
+                todo.append(idx + 1)
+        return reachable
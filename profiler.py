@@ -0,0 +1,30 @@
+"""
+Execution profile module.
+"""
+
+
+class Profile:
+    """
+    Execution profile of a PackedTable, collected by Executor in profiling mode.
+    counts: times the instruction at each address was run.
+    functions: entrance address -> [calls, inclusive seconds, exclusive seconds]. Inclusive time of a recursive
+               function is only counted for its outermost call.
+    time: seconds of the whole run.
+    """
+    def __init__(self, packed):
+        self.packed = packed
+        self.counts = [0] * len(packed)
+        self.functions = {entry: [0, 0.0, 0.0] for entry in packed.functions}
+        self.time = 0.0
+
+    def instruction_counts(self):
+        """ Get counts of instructions in the order of the table. """
+        return [self.counts[address] for address, ins in self.packed]
+
+    def operation_counts(self):
+        """ Get counts keyed by (instruction code, operation code), where operation code is None except for 'opr'. """
+        res = {}
+        for address, ins in self.packed:
+            key = (ins[0], ins[1] if ins[0] == 6 else None)
+            res[key] = res.get(key, 0) + self.counts[address]
+        return res
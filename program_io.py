@@ -0,0 +1,82 @@
+"""
+Program input and output module.
+"""
+import sys
+
+
+class ConsoleIO:
+    """
+    Read a number from each line of console, and print every number written at once.
+    """
+    write = print
+
+    @staticmethod
+    def read():
+        return int(input())
+
+    def close(self):
+        pass
+
+
+class BufferedIO:
+    """
+    Input is read as a whole at the first 'read' and split into numbers by any white space, so that it has to be
+    complete before the program runs.
+    Numbers written are kept in a buffer, which is written out once it holds 'flush_size' numbers and when closed.
+    input_file, output_file: file names, or None for standard input and output.
+    """
+    def __init__(self, input_file=None, output_file=None, flush_size=4096):
+        self._input_file = input_file
+        self._numbers = None
+        self._output = sys.stdout if output_file is None else open(output_file, 'w')
+        self._own_output = output_file is not None
+        self._buffer = []
+        self._flush_size = flush_size
+
+    def read(self):
+        if self._numbers is None:
+            if self._input_file is None:
+                text = sys.stdin.read()
+            else:
+                with open(self._input_file) as input_file:
+                    text = input_file.read()
+            self._numbers = iter([int(token) for token in text.split()])
+        try:
+            return next(self._numbers)
+        except StopIteration:
+            raise Exception('No more input to read.')
+
+    def write(self, val):
+        self._buffer.append(val)
+        if len(self._buffer) >= self._flush_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._output.write('\n'.join(map(str, self._buffer)) + '\n')
+            self._buffer.clear()
+        self._output.flush()
+
+    def close(self):
+        self.flush()
+        if self._own_output:
+            self._output.close()
+
+
+class CannedIO:
+    """
+    Numbers to read are given as a list. Numbers written are kept in 'output'.
+    """
+    def __init__(self, numbers):
+        self._numbers = iter(numbers)
+        self.output = []
+        self.write = self.output.append
+
+    def read(self):
+        try:
+            return next(self._numbers)
+        except StopIteration:
+            raise Exception('No more input to read.')
+
+    def close(self):
+        pass
@@ -0,0 +1,661 @@
+"""
+Python translation module.
+"""
+import math
+
+
+class TranslationError(Exception):
+    """ Instructions which can not be translated into structured Python code. """
+    pass
+
+
+class _Block:
+    """
+    Basic block of a function.
+    kind:   'jump' to succs[0], 'branch' to succs[0] if cond is true or else to succs[1],
+            'return' from the function or 'exit' the program.
+    """
+    def __init__(self, leader):
+        self.leader = leader
+        self.addresses = []
+        self.kind = None
+        self.succs = []
+        self.lines = []
+        self.cond = None
+
+
+class _Loop:
+    def __init__(self, header, body, follow):
+        self.header = header
+        self.body = body
+        self.follow = follow
+
+
+class PythonTranslator:
+    """
+    Ahead-of-time translation of a PackedTable into Python source code.
+
+    Every small-C function becomes a Python function whose frame slots are Python local variables 'v0', 'v1'...,
+    and the code calling 'main' becomes function '_start'. Global variables are kept in list 'g'.
+    Instructions of a basic block are turned into Python expressions with a symbolic data stack. Loops become
+    'while True' with 'continue' and 'break', and branches become 'if' / 'else' joined at their immediate
+    post-dominator.
+    TranslationError is raised for instructions or control flow which can not be structured this way.
+    """
+    _lit, _lod, _str, _cal, _jmp, _jpc, _opr, _inc, _opl, _jcs, _jcv, _jcl, _tcl = range(13)
+
+    # Binary operators, keyed by operation code.
+    _operators = {
+        1: '-', 2: '+', 3: '>', 4: '<', 5: '>=', 6: '<=', 7: '==', 8: '!=',
+        10: '*', 11: '/', 12: '%', 13: '^', 16: '&'
+    }
+    _comparisons = {3, 4, 5, 6, 7, 8}
+
+    # Python allows 100 levels of indentation and 20 nested loops.
+    _max_depth = 90
+    _max_loops = 19
+
+    def __init__(self, instruction_table):
+        self._it = instruction_table
+        self._ins = {}
+        self._next = {}
+        for address, ins in instruction_table:
+            self._ins[address] = ins
+            self._next[address] = address + len(ins)
+
+    def translate(self):
+        """ Translate the whole program. Return Python source code. """
+        entries = sorted(self._it.functions)
+        bounds = entries + [len(self._it)]
+        self._check_recursion(entries, bounds)
+        lines = ['# Translated from small-C instructions.']
+        for i in range(len(entries)):
+            lines.extend(self._function(entries[i], bounds[i + 1]))
+        lines.extend(self._function(0, bounds[0]))
+        return '\n'.join(lines) + '\n'
+
+    def compile(self):
+        """ Translate and compile the whole program. Return a function running it with given read and write. """
+        code = compile(self.translate(), '<small-C>', 'exec')
+
+        def run(read, write):
+            namespace = {'g': [], 'read': read, 'write': write}
+            exec(code, namespace)
+            namespace['_start']()
+        return run
+
+    # Every call takes a Python frame, so that recursion as deep as the other engines run would overflow the Python
+    # stack halfway through the program. Functions calling each other in a cycle are left to the interpreter, but for
+    # a function calling itself in place, which is translated into a loop.
+    def _check_recursion(self, entries, bounds):
+        callees = {entry: set() for entry in entries}
+        for i, entry in enumerate(entries):
+            address = entry
+            while address < bounds[i + 1]:
+                ins = self._ins[address]
+                if ins[0] == self._cal or ins[0] == self._tcl and ins[1] != entry:
+                    callees[entry].add(ins[1])
+                address = self._next[address]
+        # Depth first search, a function being 1 while its callees are searched and 2 afterwards.
+        state = {}
+        for root in entries:
+            if root in state:
+                continue
+            state[root] = 1
+            stack = [(root, iter(callees[root]))]
+            while stack:
+                node, succs = stack[-1]
+                for succ in succs:
+                    if state.get(succ) == 1:
+                        raise TranslationError('Recursive calls.')
+                    if succ not in state:
+                        state[succ] = 1
+                        stack.append((succ, iter(callees.get(succ, ()))))
+                        break
+                else:
+                    state[node] = 2
+                    stack.pop()
+
+    def _function(self, entry, end):
+        """ Translate a function in [entry, end), or the top-level code if entry is 0. """
+        self._top_level = entry == 0
+        self._entry = entry
+        self._temp_num = 0
+        if self._top_level:
+            head = 'def _start():'
+            start = entry
+            frame_size = 0
+        else:
+            name, param_num, return_void = self._it.functions[entry]
+            start = entry
+            for i in range(param_num):
+                if start >= end or self._ins[start][:2] != [self._str, -1]:
+                    raise TranslationError('Parameters of \'' + name + '\' not found.')
+                start = self._next[start]
+            head = 'def f' + str(entry) + '(' + ', '.join('v' + str(i) for i in range(param_num - 1, -1, -1)) + '):'
+            frame_size = param_num
+        self._build_blocks(start, end)
+        self._translate_blocks(start, frame_size)
+        self._find_structure(start)
+        self._out = [head]
+        self._out_limit = 4 * sum(len(self._blocks[b].lines) + 2 for b in self._order) + 100
+        self._emit(start, None, [], 1)
+        return self._out
+
+    # Split instructions in [start, end) into basic blocks.
+    def _build_blocks(self, start, end):
+        exit_address = len(self._it)
+        addresses = []
+        address = start
+        while address < end:
+            addresses.append(address)
+            address = self._next[address]
+        leaders = {start}
+        for address in addresses:
+            ins = self._ins[address]
+            if ins[0] in (self._jmp, self._jpc, self._jcs, self._jcv, self._jcl):
+                if start <= ins[2] < end:
+                    leaders.add(ins[2])
+                elif not (self._top_level and ins[0] == self._jmp and ins[2] == exit_address):
+                    raise TranslationError('Jump out of function.')
+                leaders.add(self._next[address])
+            elif ins[0] == self._opr and ins[1] == 0 or ins[0] == self._tcl:
+                leaders.add(self._next[address])
+
+        self._blocks = {}
+        block = None
+        for address in addresses:
+            if address in leaders:
+                block = _Block(address)
+                self._blocks[address] = block
+            elif block.kind is not None:
+                continue
+            block.addresses.append(address)
+            ins = self._ins[address]
+            nxt = self._next[address]
+            if ins[0] == self._jmp:
+                block.kind = 'exit' if ins[2] == exit_address else 'jump'
+                block.succs = [] if ins[2] == exit_address else [ins[2]]
+            elif ins[0] in (self._jpc, self._jcs, self._jcv, self._jcl):
+                block.kind = 'branch'
+                block.succs = [ins[2], nxt]
+            elif ins[0] == self._tcl and ins[1] == self._entry:
+                # Calling itself in place goes back to the start with new parameters, making a loop.
+                block.kind = 'jump'
+                block.succs = [start]
+            elif ins[0] == self._opr and ins[1] == 0 or ins[0] == self._tcl:
+                block.kind = 'return'
+            elif nxt in leaders or nxt >= end:
+                block.kind = 'jump'
+                block.succs = [nxt]
+            if nxt >= end and block.kind == 'branch' or block.succs and block.succs[-1] >= end \
+                    and block.kind != 'exit':
+                raise TranslationError('Control flow falls out of function.')
+
+    # Translate instructions of every reachable block, following frame size along control flow.
+    def _translate_blocks(self, start, frame_size):
+        frame_sizes = {start: frame_size}
+        self._order = [start]
+        idx = 0
+        while idx < len(self._order):
+            block = self._blocks[self._order[idx]]
+            size = self._translate_block(block, frame_sizes[block.leader])
+            for succ in block.succs:
+                if succ not in frame_sizes:
+                    frame_sizes[succ] = size
+                    self._order.append(succ)
+                elif frame_sizes[succ] != size:
+                    raise TranslationError('Frame size differs between branches.')
+            idx += 1
+
+    # Find loops, back edges and immediate post-dominators of reachable blocks.
+    def _find_structure(self, start):
+        blocks = self._blocks
+        # Reverse post order.
+        rpo = []
+        visited = {start}
+        stack = [(start, iter(blocks[start].succs))]
+        while stack:
+            node, succs = stack[-1]
+            for succ in succs:
+                if succ not in visited:
+                    visited.add(succ)
+                    stack.append((succ, iter(blocks[succ].succs)))
+                    break
+            else:
+                stack.pop()
+                rpo.append(node)
+        rpo.reverse()
+        preds = {b: [] for b in rpo}
+        for b in rpo:
+            for succ in blocks[b].succs:
+                preds[succ].append(b)
+        idom = self._idoms(rpo, preds)
+
+        # Back edges go to a block dominating the source. Other edges going backwards make the graph irreducible.
+        order = {b: i for i, b in enumerate(rpo)}
+        back_edges = set()
+        for b in rpo:
+            for succ in blocks[b].succs:
+                if order[succ] <= order[b]:
+                    node = b
+                    while node != succ and node != idom[node]:
+                        node = idom[node]
+                    if node != succ:
+                        raise TranslationError('Irreducible control flow.')
+                    back_edges.add((b, succ))
+
+        self._loops = {}
+        for header in {succ for b, succ in back_edges}:
+            body = {header}
+            work = [b for b, succ in back_edges if succ == header]
+            while work:
+                node = work.pop()
+                if node not in body:
+                    body.add(node)
+                    work.extend(preds[node])
+            exits = {succ for b in body for succ in blocks[b].succs if succ not in body}
+            # Code only reached from a loop and never coming back, like 'return' in a loop, goes into the loop.
+            for succ in list(exits):
+                tail = self._tail(succ, idom)
+                if tail is not None:
+                    body |= tail
+                    exits.discard(succ)
+            if len(exits) > 1:
+                raise TranslationError('Loop with more than one exit.')
+            self._loops[header] = _Loop(header, body, exits.pop() if exits else None)
+
+        # Post-dominators on forward edges. Returning, exiting and going back to a loop header all end at -1.
+        rsuccs = {b: [] for b in rpo}
+        rsuccs[-1] = []
+        for b in rpo:
+            fsuccs = [succ for succ in blocks[b].succs if (b, succ) not in back_edges]
+            if len(fsuccs) < len(blocks[b].succs) or blocks[b].kind in ('return', 'exit'):
+                fsuccs.append(-1)
+            for succ in fsuccs:
+                rsuccs[succ].append(b)
+        rrpo = []
+        visited = {-1}
+        stack = [(-1, iter(rsuccs[-1]))]
+        while stack:
+            node, succs = stack[-1]
+            for succ in succs:
+                if succ not in visited:
+                    visited.add(succ)
+                    stack.append((succ, iter(rsuccs[succ])))
+                    break
+            else:
+                stack.pop()
+                rrpo.append(node)
+        rrpo.reverse()
+        rpreds = {b: [] for b in rrpo}
+        for b in rrpo:
+            for succ in rsuccs[b]:
+                rpreds[succ].append(b)
+        self._ipdom = self._idoms(rrpo, rpreds)
+
+    # Blocks reachable from 'b', if all of them are dominated by 'b'.
+    def _tail(self, b, idom):
+        tail = {b}
+        work = [b]
+        while work:
+            for succ in self._blocks[work.pop()].succs:
+                if succ in tail:
+                    continue
+                node = succ
+                while node != b and node != idom[node]:
+                    node = idom[node]
+                if node != b:
+                    return None
+                tail.add(succ)
+                work.append(succ)
+        return tail
+
+    # Immediate dominators of nodes in reverse post order, by Cooper, Harvey and Kennedy.
+    @staticmethod
+    def _idoms(rpo, preds):
+        order = {b: i for i, b in enumerate(rpo)}
+        idom = {rpo[0]: rpo[0]}
+
+        def intersect(a, b):
+            while a != b:
+                while order[a] > order[b]:
+                    a = idom[a]
+                while order[b] > order[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for b in rpo[1:]:
+                new_idom = None
+                for pred in preds[b]:
+                    if pred in idom:
+                        new_idom = pred if new_idom is None else intersect(pred, new_idom)
+                if idom.get(b) != new_idom:
+                    idom[b] = new_idom
+                    changed = True
+        return idom
+
+    # Emit structured code from block 'b' until reaching 'stop'. Return True if every path ends in
+    # 'return', 'continue' or 'break' before reaching 'stop'.
+    def _emit(self, b, stop, loops, depth, enter=False):
+        if depth > self._max_depth:
+            raise TranslationError('Nested too deep.')
+        while True:
+            if b == stop:
+                return False
+            loop = loops[-1] if loops else None
+            if loop is not None and not enter:
+                if b == loop.header:
+                    self._line(depth, 'continue')
+                    return True
+                if b == loop.follow:
+                    self._line(depth, 'break')
+                    return True
+                if b not in loop.body:
+                    raise TranslationError('Jump out of nested loop.')
+            if b in self._loops and not enter:
+                if len(loops) >= self._max_loops:
+                    raise TranslationError('Too many nested loops.')
+                self._line(depth, 'while True:')
+                self._emit(b, None, loops + [self._loops[b]], depth + 1, True)
+                if self._loops[b].follow is None:
+                    return True
+                b = self._loops[b].follow
+                continue
+            enter = False
+
+            block = self._blocks[b]
+            for line in block.lines:
+                self._line(depth, line)
+            if block.kind == 'return':
+                return True
+            if block.kind == 'exit':
+                self._line(depth, 'return')
+                return True
+            if block.kind == 'jump':
+                b = block.succs[0]
+                continue
+
+            taken, fall = block.succs
+            join = self._ipdom[b]
+            join = None if join == -1 else join
+            if join is not None and taken == join:
+                self._line(depth, 'if ' + self._negate(block.cond) + ':')
+                self._arm(fall, join, loops, depth + 1)
+                b = join
+                continue
+            self._line(depth, 'if ' + block.cond + ':')
+            if join is not None:
+                self._arm(taken, join, loops, depth + 1)
+                if fall != join:
+                    self._line(depth, 'else:')
+                    self._arm(fall, join, loops, depth + 1)
+                b = join
+                continue
+            if not self._arm(taken, stop, loops, depth + 1):
+                self._line(depth, 'else:')
+                self._arm(fall, stop, loops, depth + 1)
+                return False
+            b = fall
+
+    # Emit an arm of 'if' or 'else'.
+    def _arm(self, b, stop, loops, depth):
+        length = len(self._out)
+        res = self._emit(b, stop, loops, depth)
+        if len(self._out) == length:
+            self._line(depth, 'pass')
+        return res
+
+    def _line(self, depth, line):
+        if len(self._out) > self._out_limit:
+            raise TranslationError('Structured code too large.')
+        self._out.append('    ' * depth + line)
+
+    # Conditions are either 'not (...)', 'not name' or can be negated as a whole.
+    @staticmethod
+    def _negate(cond):
+        if cond.startswith('not '):
+            return cond[4:]
+        return 'not (' + cond + ')'
+
+    # Name of variable at an address.
+    def _var(self, address):
+        if address < 0:
+            return 'g[' + str(address * -1 - 2) + ']'
+        if self._top_level:
+            return 'g[' + str(address) + ']'
+        return 'v' + str(address)
+
+    def _temp(self):
+        self._temp_num += 1
+        return 't' + str(self._temp_num)
+
+    @staticmethod
+    def _literal(val):
+        if isinstance(val, float) and not math.isfinite(val):
+            raise TranslationError('Literal can not be written in Python.')
+        return repr(val)
+
+    # Data stack entries are (expression, stable, boolean). A stable expression is not changed by storing any
+    # variable. A boolean expression is a comparison to be turned into 1 or 0 when used as a number.
+    @staticmethod
+    def _value(entry):
+        if entry[2]:
+            return '(1 if ' + entry[0] + ' else 0)'
+        return entry[0]
+
+    # Evaluate unstable expressions on data stack into temporary variables, before anything is changed.
+    def _spill(self, stack, lines):
+        for i, entry in enumerate(stack):
+            if not entry[1]:
+                temp = self._temp()
+                lines.append(temp + ' = ' + entry[0])
+                stack[i] = (temp, True, entry[2])
+
+    def _binary(self, opr_code, a, b):
+        text = '(' + self._value(b) + ' ' + self._operators[opr_code] + ' ' + self._value(a) + ')'
+        return text, a[1] and b[1], opr_code in self._comparisons
+
+    def _pop(self, stack):
+        if not stack:
+            raise TranslationError('Data stack used across blocks.')
+        return stack.pop()
+
+    # Translate instructions of a block into Python lines. Return frame size at the end of the block.
+    def _translate_block(self, block, frame_size):
+        stack = []
+        lines = block.lines
+        for address in block.addresses:
+            ins = self._ins[address]
+            code = ins[0]
+            if code == self._lit:
+                stack.append((self._literal(ins[2]), True, False))
+            elif code == self._lod:
+                stack.append((self._var(ins[1]), False, False))
+            elif code == self._str:
+                value = self._value(self._pop(stack))
+                self._spill(stack, lines)
+                if ins[1] != -1:
+                    lines.append(self._var(ins[1]) + ' = ' + value)
+                elif self._top_level:
+                    lines.append('g.append(' + value + ')')
+                    frame_size += 1
+                else:
+                    lines.append(self._var(frame_size) + ' = ' + value)
+                    frame_size += 1
+            elif code == self._cal or code == self._tcl:
+                if ins[1] not in self._it.functions:
+                    raise TranslationError('Calling unknown function.')
+                name, param_num, return_void = self._it.functions[ins[1]]
+                if len(stack) < param_num:
+                    raise TranslationError('Data stack used across blocks.')
+                args = [self._value(entry) for entry in stack[len(stack) - param_num:]]
+                del stack[len(stack) - param_num:]
+                self._spill(stack, lines)
+                call = 'f' + str(ins[1]) + '(' + ', '.join(args) + ')'
+                if code == self._tcl and ins[1] == self._entry:
+                    # Parameters are set all at once, as arguments may read them. Other variables are defined again.
+                    if param_num:
+                        params = [self._var(param_num - 1 - i) for i in range(param_num)]
+                        lines.append(', '.join(params) + ' = ' + ', '.join(args))
+                    frame_size = param_num
+                # A tail call to another function is still a Python call, returning what the callee returns.
+                elif code == self._tcl:
+                    lines.append(call if return_void else 'return ' + call)
+                    if return_void:
+                        lines.append('return')
+                elif return_void:
+                    lines.append(call)
+                else:
+                    temp = self._temp()
+                    lines.append(temp + ' = ' + call)
+                    stack.append((temp, True, False))
+            elif code == self._jpc:
+                entry = self._pop(stack)
+                if not entry[2]:
+                    block.cond = entry[0] + ' == ' + str(ins[1])
+                elif ins[1] == 1:
+                    block.cond = entry[0]
+                elif ins[1] == 0:
+                    block.cond = 'not ' + entry[0]
+                else:
+                    block.cond = 'False'
+            elif code == self._opr:
+                if ins[1] == -1:
+                    frame_size -= ins[2]
+                elif ins[1] == 0:
+                    if stack:
+                        lines.append('return ' + self._value(stack.pop()))
+                    else:
+                        lines.append('return')
+                elif ins[1] in self._operators:
+                    a = self._pop(stack)
+                    b = self._pop(stack)
+                    stack.append(self._binary(ins[1], a, b))
+                elif ins[1] == 9:
+                    a = self._pop(stack)
+                    stack.append(('(' + self._value(a) + ' & 1)', a[1], False))
+                elif ins[1] == 14:
+                    self._spill(stack, lines)
+                    lines.append(self._var(ins[2]) + ' = read()')
+                elif ins[1] == 15:
+                    value = self._value(self._pop(stack))
+                    self._spill(stack, lines)
+                    lines.append('write(' + value + ')')
+                else:
+                    raise TranslationError('Unknown operation.')
+            elif code == self._inc:
+                self._spill(stack, lines)
+                lines.append(self._var(ins[1]) + ' += ' + self._literal(ins[2]))
+            elif code == self._opl:
+                a = self._pop(stack)
+                stack.append(self._binary(ins[1], (self._literal(ins[2]), True, False), a))
+            elif code == self._jcs:
+                a = self._pop(stack)
+                b = self._pop(stack)
+                block.cond = 'not ' + self._binary(ins[1], a, b)[0]
+            elif code == self._jcv:
+                block.cond = 'not (' + self._var(ins[3]) + ' ' + self._operators[ins[1]] + ' ' + self._var(ins[4]) + ')'
+            elif code == self._jcl:
+                block.cond = 'not (' + self._var(ins[3]) + ' ' + self._operators[ins[1]] + ' ' \
+                             + self._literal(ins[4]) + ')'
+            elif code != self._jmp:
+                raise TranslationError('Unknown instruction.')
+        if stack:
+            raise TranslationError('Data stack used across blocks.')
+        return frame_size
+
+
+class TraceTranslator(PythonTranslator):
+    """
+    Translation of one recorded iteration of a loop into a Python function 'trace(vs, fp)', looping until a
+    branch leaves the recorded path.
+
+    Variables used by the trace are kept in Python local variables while looping. Where the trace is left, they
+    are written back to variable stack 'vs' (with frame pointer 'fp') and the address to continue at is returned.
+    """
+    def __init__(self, instructions, frame_size):
+        """
+        instructions: address -> instruction, covering at least the trace.
+        frame_size: number of variables in current frame at the loop head.
+        """
+        self._ins = instructions
+        self._frame_size = frame_size
+        self._top_level = False
+        self._temp_num = 0
+        self._used = set()
+
+    def translate(self, path):
+        """
+        path: (address, next address) of each instruction run in one iteration, back to the first address.
+        Return Python source code.
+        """
+        body = []
+        block = _Block(path[0][0])
+        frame_size = self._frame_size
+        # Variables stored to, which are written back when leaving.
+        stored = set()
+        for address, nxt in path:
+            ins = self._ins[address]
+            if ins[0] == self._cal or ins[0] == self._tcl or ins[0] == self._opr and ins[1] == 0:
+                raise TranslationError('Calls are not traced.')
+            if ins[0] == self._str and ins[1] != -1 or ins[0] == self._inc:
+                stored.add(ins[1])
+            elif ins[0] == self._opr and ins[1] == 14:
+                stored.add(ins[2])
+            block.addresses.append(address)
+            if ins[0] in (self._jmp, self._jpc, self._jcs, self._jcv, self._jcl):
+                frame_size = self._translate_block(block, frame_size)
+                body.extend(block.lines)
+                if ins[0] != self._jmp:
+                    if nxt == ins[2]:
+                        body.append((self._negate(block.cond), address + len(ins), frame_size))
+                    else:
+                        body.append((block.cond, ins[2], frame_size))
+                block = _Block(nxt)
+        if block.addresses or frame_size != self._frame_size:
+            raise TranslationError('Trace does not go back to the loop head.')
+
+        lines = ['def trace(vs, fp):']
+        for address in sorted(self._used):
+            if address < self._frame_size:
+                lines.append('    ' + self._var(address) + ' = ' + self._slot(address))
+        lines.append('    while True:')
+        for line in body:
+            if isinstance(line, str):
+                lines.append('        ' + line)
+                continue
+            cond, leave, frame_size = line
+            lines.append('        if ' + cond + ':')
+            for address in sorted(stored):
+                if address < min(frame_size, self._frame_size):
+                    lines.append('            ' + self._slot(address) + ' = ' + self._var(address))
+            if frame_size > self._frame_size:
+                lines.append('            vs.extend((' + ''.join(self._var(address) + ', ' for address in
+                                                             range(self._frame_size, frame_size)) + '))')
+            elif frame_size < self._frame_size:
+                lines.append('            del vs[fp + ' + str(frame_size) + ':]')
+            lines.append('            return ' + str(leave))
+        return '\n'.join(lines) + '\n'
+
+    def compile(self, path, read, write):
+        """ Translate and compile a trace using given read and write. Return function 'trace'. """
+        namespace = {'read': read, 'write': write}
+        exec(compile(self.translate(path), '<trace>', 'exec'), namespace)
+        return namespace['trace']
+
+    def _var(self, address):
+        self._used.add(address)
+        if address < 0:
+            return 'g' + str(address * -1 - 2)
+        return 'v' + str(address)
+
+    # Place of a variable in variable stack.
+    @staticmethod
+    def _slot(address):
+        if address < 0:
+            return 'vs[' + str(address * -1 - 2) + ']'
+        return 'vs[fp + ' + str(address) + ']'
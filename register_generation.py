@@ -0,0 +1,282 @@
+"""
+Register code generation module.
+"""
+from syntax_tree import Number, Variable, BinaryOp, Odd, SelfOp, Call, VarDecl, Assign, Read, Write, If, While, \
+    DoWhile, Repeat, For, Return, Block
+
+
+class RegisterGenerator:
+    """
+    Generate three-address instructions of a syntax tree into a RegisterTable.
+
+    An expression is generated into the slot it is given, or into a new temporary, except that a local variable
+    or a constant is used from its own slot. Temporaries take the slots after the variables defined so far, and
+    are free again after each statement.
+    """
+    # Comparison operation codes and their opposites.
+    _negation = {3: 6, 4: 5, 5: 4, 6: 3, 7: 8, 8: 7}
+
+    def __init__(self, rt):
+        self._rt = rt
+        self._entries = {}
+        # Number of variables in current frame, next free slot and number of slots used so far.
+        self._count = 0
+        self._next = 0
+        self._slots = 0
+        # Constant -> its slot, '-1 - index' until the frame is set.
+        self._consts = {}
+        self._handlers = {
+            VarDecl: self._var_decl, Assign: self._assign, Read: self._read, Write: self._write, If: self._if,
+            While: self._while, DoWhile: self._do_while, Repeat: self._repeat, For: self._for,
+            Return: self._return, Block: self._block, Call: self._call_statement
+        }
+
+    def generate(self, program):
+        """ Generate a whole program. Return the register table. """
+        self._rt.add_func('top level', 0, True)
+        self._start_frame(0)
+        for idx, var in enumerate(program.variables):
+            self._next = self._count
+            slot = self._const(0) if var.init is None else self._exp(var.init)
+            self._rt.gen('gst', idx, slot)
+        main_ins = self._rt.gen('cal', None, None, [])
+        end_ins = self._rt.gen('jmp', None)
+        self._end_frame(0, 0)
+        for func in program.functions:
+            self._function(func)
+        main_ins[1] = self._entries['main']
+        end_ins[1] = self._rt.next_line_num
+        return self._rt
+
+    def _start_frame(self, count):
+        self._count = self._next = self._slots = count
+        self._consts = {}
+
+    def _end_frame(self, entry, start):
+        consts = sorted(self._consts, key=lambda key: -self._consts[key])
+        self._rt.set_frame(entry, start, self._slots, [val for kind, val in consts])
+
+    def _function(self, func):
+        if func.cached is not None:
+            raise Exception('Function \'' + func.name + '\' taken from a cache can not be generated into registers.')
+        entry = self._rt.next_line_num
+        self._entries[func.name] = entry
+        self._rt.add_func(func.name, len(func.params), func.return_void)
+        self._start_frame(len(func.params))
+        self._block(func.body)
+        self._rt.gen('ret', None)
+        self._end_frame(entry, entry)
+
+    # Slots.
+
+    def _temp(self):
+        slot = self._next
+        self._next += 1
+        self._slots = max(self._slots, self._next)
+        return slot
+
+    # Type is a part of the key so that 1 and 1.0 are kept apart.
+    def _const(self, val):
+        key = (type(val), val)
+        if key not in self._consts:
+            self._consts[key] = -1 - len(self._consts)
+        return self._consts[key]
+
+    # Tell if a slot holds a variable, which could be changed before it is used.
+    def _is_variable(self, slot):
+        return 0 <= slot < self._count
+
+    # Tell if evaluating an expression changes a local variable.
+    def _changes_locals(self, node):
+        if isinstance(node, SelfOp) and node.address >= 0:
+            return True
+        return any(self._changes_locals(child) for child in node.children())
+
+    # Generate expressions evaluated in order. Return their slots.
+    # A variable is copied if an expression after it could change it, as it has to be read first.
+    def _operands(self, nodes):
+        slots = []
+        for idx, node in enumerate(nodes):
+            slot = self._exp(node)
+            if self._is_variable(slot) and any(self._changes_locals(later) for later in nodes[idx + 1:]):
+                temp = self._temp()
+                self._rt.gen('mov', temp, slot)
+                slot = temp
+            slots.append(slot)
+        return slots
+
+    # Expressions.
+
+    def _exp(self, node, dst=None):
+        """ Generate an expression. Return the slot of its value, which is 'dst' if it is given. """
+        if isinstance(node, Number):
+            slot = self._const(node.value)
+        elif isinstance(node, Variable):
+            if node.address >= 0:
+                slot = node.address
+            else:
+                slot = self._temp() if dst is None else dst
+                self._rt.gen('gld', slot, -2 - node.address)
+        elif isinstance(node, BinaryOp):
+            a, b = self._operands([node.left, node.right])
+            slot = self._temp() if dst is None else dst
+            self._rt.gen('opr', node.opr, slot, a, b)
+        elif isinstance(node, Odd):
+            a = self._exp(node.operand)
+            slot = self._temp() if dst is None else dst
+            self._rt.gen('odd', slot, a)
+        elif isinstance(node, SelfOp):
+            slot = self._self_op(node)
+        elif isinstance(node, Call):
+            slot = self._temp() if dst is None else dst
+            self._call(node, slot)
+        else:
+            raise Exception('Unknown expression.')
+        if dst is not None and slot != dst:
+            self._rt.gen('mov', dst, slot)
+            slot = dst
+        return slot
+
+    def _self_op(self, node):
+        delta = self._const(node.delta)
+        if node.address >= 0:
+            var = node.address
+        else:
+            var = self._temp()
+            self._rt.gen('gld', var, -2 - node.address)
+        slot = var
+        if not node.prefix:
+            slot = self._temp()
+            self._rt.gen('mov', slot, var)
+        self._rt.gen('opr', 2, var, var, delta)
+        if node.address < 0:
+            self._rt.gen('gst', -2 - node.address, var)
+        return slot
+
+    def _call(self, node, dst):
+        self._rt.gen('cal', self._entries[node.name], dst, self._operands(node.args))
+
+    def _tail_call(self, node):
+        self._rt.gen('tcl', self._entries[node.name], self._operands(node.args))
+
+    # Generate a jump taken if the value of a condition is 'c', or is not if 'equal' is False. Return the jump,
+    # whose target is the last field.
+    def _jump_if(self, cond, c, equal=True):
+        if isinstance(cond, BinaryOp) and cond.opr in self._negation:
+            a, b = self._operands([cond.left, cond.right])
+            # A comparison is 1 or 0, so that jumping if it is 0, or is not 1, is jumping unless it holds.
+            fails = (c == 0) == equal
+            return self._rt.gen('jcf', cond.opr if fails else self._negation[cond.opr], a, b, None)
+        return self._rt.gen('jeq' if equal else 'jne', c, self._exp(cond), None)
+
+    # Statements.
+
+    def _gen(self, node):
+        self._next = self._count
+        self._handlers[type(node)](node)
+
+    def _call_statement(self, node):
+        self._call(node, None)
+
+    def _store(self, address, value):
+        if address >= 0:
+            self._exp(value, address)
+        else:
+            self._rt.gen('gst', -2 - address, self._exp(value))
+
+    def _var_decl(self, node):
+        slot = self._count
+        self._count += 1
+        self._next = self._count
+        self._slots = max(self._slots, self._count)
+        self._exp(Number(0) if node.init is None else node.init, slot)
+
+    def _assign(self, node):
+        self._store(node.address, node.value)
+
+    def _read(self, node):
+        for var in node.variables:
+            if var.address >= 0:
+                self._rt.gen('red', var.address)
+            else:
+                temp = self._temp()
+                self._rt.gen('red', temp)
+                self._rt.gen('gst', -2 - var.address, temp)
+
+    def _write(self, node):
+        for val in node.values:
+            self._rt.gen('wrt', self._exp(val))
+
+    # tail: if the function returns right after the statement.
+    def _if(self, node, tail=False):
+        end_ins = []
+        for cond, block in zip(node.conditions, node.blocks):
+            self._next = self._count
+            jmp_ins = self._jump_if(cond, 0)
+            self._block(block, tail)
+            end_ins.append(self._rt.gen('jmp', None))
+            jmp_ins[-1] = self._rt.next_line_num
+        if node.orelse is not None:
+            self._block(node.orelse, tail)
+        for ins in end_ins:
+            ins[1] = self._rt.next_line_num
+
+    def _while(self, node):
+        jmp_back_idx = self._rt.next_line_num
+        jmp_out_ins = self._jump_if(node.condition, 0)
+        self._block(node.body)
+        self._rt.gen('jmp', jmp_back_idx)
+        jmp_out_ins[-1] = self._rt.next_line_num
+
+    def _do_while(self, node):
+        jmp_back_idx = self._rt.next_line_num
+        self._block(node.body)
+        self._next = self._count
+        self._jump_if(node.condition, 0, False)[-1] = jmp_back_idx
+
+    def _repeat(self, node):
+        jmp_back_idx = self._rt.next_line_num
+        self._block(node.body)
+        self._next = self._count
+        self._jump_if(node.condition, 1, False)[-1] = jmp_back_idx
+
+    def _for(self, node):
+        for statement in node.init:
+            self._gen(statement)
+        back_to_judge = self._rt.next_line_num
+        self._next = self._count
+        jmp_out_ins = self._jump_if(node.condition, 0)
+        self._block(node.body)
+        for statement in node.step:
+            self._gen(statement)
+        self._rt.gen('jmp', back_to_judge)
+        jmp_out_ins[-1] = self._rt.next_line_num
+
+    def _return(self, node):
+        if isinstance(node.value, Call):
+            self._tail_call(node.value)
+        elif node.value is not None:
+            self._rt.gen('ret', self._exp(node.value))
+        else:
+            self._rt.gen('ret', None)
+
+    # Variables of a block are dropped at its end, so that its slots are used again.
+    # tail: if the function returns right after the block. By default only after its outermost block.
+    def _block(self, node, tail=None):
+        if tail is None:
+            tail = node.release is None
+        count = self._count
+        for idx, statement in enumerate(node.statements):
+            if idx + 1 < len(node.statements):
+                nxt = node.statements[idx + 1]
+                returns = isinstance(nxt, Return) and nxt.value is None
+            else:
+                returns = tail
+            self._next = self._count
+            if returns and isinstance(statement, Call):
+                self._tail_call(statement)
+            elif returns and isinstance(statement, If):
+                self._if(statement, True)
+            else:
+                self._gen(statement)
+        self._count = count
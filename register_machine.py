@@ -0,0 +1,221 @@
+"""
+Register machine module.
+"""
+from executor import Executor
+from program_io import ConsoleIO
+
+
+class RegisterMachine:
+    """
+    Run a RegisterTable. Like the 'table' engine of Executor, every instruction is decoded once into a handler
+    closure returning the index of the next instruction, but operands are read from and results written to slots
+    of current frame, so that no data stack is needed.
+    """
+
+    # table: a RegisterTable.
+    # io: object with 'read', 'write' and 'close', ConsoleIO by default.
+    # count: count instructions run, kept in 'dispatches' afterwards.
+    def __init__(self, table, io=None, count=False):
+        self._table = table
+        self._io = ConsoleIO() if io is None else io
+        self._count = count
+        self.dispatches = 0
+        self._globals = []
+        # Return instruction index, frame and slot for the return value of callers.
+        self._callStack = []
+
+    def execute(self):
+        """ Run the register table. """
+        try:
+            handlers = self._decode()
+            cur_ins = 0
+            len_rt = len(handlers)
+            if not self._count:
+                while cur_ins != len_rt:
+                    cur_ins = handlers[cur_ins]()
+                return
+            dispatches = 0
+            while cur_ins != len_rt:
+                cur_ins = handlers[cur_ins]()
+                dispatches += 1
+            self.dispatches = dispatches
+        finally:
+            self._io.close()
+
+    def _decode(self):
+        """
+        Translate every instruction of the table into a handler closure. Slots, constants and operations are
+        resolved here once.
+        """
+        table = self._table.table
+        functions = self._table.functions
+        g = self._globals
+        g.extend([0] * (max([ins[1] for ins in table if ins[0] == 4], default=-1) + 1))
+        call_stack = self._callStack
+        push_call = call_stack.append
+        pop_call = call_stack.pop
+        read = self._io.read
+        write = self._io.write
+        # Changed by handlers of 'cal', 'tcl' and 'ret'.
+        frame = functions[0][3][:]
+
+        # 0: mov
+        def mov(nxt, d, a):
+            def handler():
+                frame[d] = frame[a]
+                return nxt
+            return handler
+
+        # 1: opr, with the most common operations written out.
+        def opr(nxt, k, d, a, b):
+            if k == 2:
+                def handler():
+                    frame[d] = frame[a] + frame[b]
+                    return nxt
+                return handler
+            if k == 1:
+                def handler():
+                    frame[d] = frame[a] - frame[b]
+                    return nxt
+                return handler
+            if k == 10:
+                def handler():
+                    frame[d] = frame[a] * frame[b]
+                    return nxt
+                return handler
+            if k in Executor._comparison:
+                test = Executor._comparison[k]
+
+                def handler():
+                    frame[d] = 1 if test(frame[a], frame[b]) else 0
+                    return nxt
+                return handler
+            if k not in Executor._arithmetic:
+                raise Exception('Operation code error.')
+            calc = Executor._arithmetic[k]
+
+            def handler():
+                frame[d] = calc(frame[a], frame[b])
+                return nxt
+            return handler
+
+        # 2: odd
+        def odd(nxt, d, a):
+            def handler():
+                frame[d] = frame[a] & 1
+                return nxt
+            return handler
+
+        # 3: gld
+        def gld(nxt, d, i):
+            def handler():
+                frame[d] = g[i]
+                return nxt
+            return handler
+
+        # 4: gst
+        def gst(nxt, i, a):
+            def handler():
+                g[i] = frame[a]
+                return nxt
+            return handler
+
+        # 5: jmp
+        def jmp(nxt, target):
+            def handler():
+                return target
+            return handler
+
+        # 6: jeq
+        def jeq(nxt, c, a, target):
+            def handler():
+                if frame[a] == c:
+                    return target
+                return nxt
+            return handler
+
+        # 7: jne
+        def jne(nxt, c, a, target):
+            def handler():
+                if frame[a] != c:
+                    return target
+                return nxt
+            return handler
+
+        # 8: jcf
+        def jcf(nxt, k, a, b, target):
+            test = Executor._comparison[k]
+
+            def handler():
+                if test(frame[a], frame[b]):
+                    return nxt
+                return target
+            return handler
+
+        # Pairs of (parameter slot, argument slot). The first parameter takes the last parameter slot.
+        def passing(args):
+            return [(len(args) - 1 - idx, arg) for idx, arg in enumerate(args)]
+
+        # 9: cal
+        def cal(nxt, entry, d, args):
+            template = functions[entry][3]
+            params = passing(args)
+
+            def handler():
+                nonlocal frame
+                new = template[:]
+                for slot, arg in params:
+                    new[slot] = frame[arg]
+                push_call((nxt, frame, d))
+                frame = new
+                return entry
+            return handler
+
+        # 10: tcl
+        def tcl(nxt, entry, args):
+            template = functions[entry][3]
+            params = passing(args)
+
+            def handler():
+                nonlocal frame
+                new = template[:]
+                for slot, arg in params:
+                    new[slot] = frame[arg]
+                frame = new
+                return entry
+            return handler
+
+        # 11: ret
+        def ret(nxt, a):
+            if a is None:
+                def handler():
+                    nonlocal frame
+                    ret_ins, frame, d = pop_call()
+                    return ret_ins
+                return handler
+
+            def handler():
+                nonlocal frame
+                value = frame[a]
+                ret_ins, frame, d = pop_call()
+                if d is not None:
+                    frame[d] = value
+                return ret_ins
+            return handler
+
+        # 12: red
+        def red(nxt, d):
+            def handler():
+                frame[d] = read()
+                return nxt
+            return handler
+
+        # 13: wrt
+        def wrt(nxt, a):
+            def handler():
+                write(frame[a])
+                return nxt
+            return handler
+
+        instructions = [mov, opr, odd, gld, gst, jmp, jeq, jne, jcf, cal, tcl, ret, red, wrt]
+        return [instructions[ins[0]](idx + 1, *ins[1:]) for idx, ins in enumerate(table)]
@@ -0,0 +1,124 @@
+"""
+Register instruction table module.
+"""
+import os
+from register_machine import RegisterMachine
+
+
+class RegisterTable:
+    """
+    A program in three-address instructions working on frame slots, run by RegisterMachine.
+
+    Every function has a frame of a fixed size: its variables take the slots given by SymbolTable, temporaries
+    take the slots after them, and constants used by the function take the last slots, filled in when the frame is
+    created. Global variables are only reached by 'gld' and 'gst'. The top-level code, defining global variables
+    and calling 'main', has a frame of its own.
+
+    Instructions, with 'd', 'a', 'b' frame slots and 'L' an instruction index:
+    mov d a             d = a
+    opr k d a b         d = a k b, 'k' being a binary operation code of Executor
+    odd d a             d = 1 if a is odd else 0
+    gld d i             d = global variable i
+    gst i a             global variable i = a
+    jmp L               jump to L
+    jeq c a L           jump to L if a == c
+    jne c a L           jump to L if a != c
+    jcf k a b L         jump to L unless a k b, 'k' being a comparison
+    cal e d args        call function at e with values of slots 'args', return value into d (None if void)
+    tcl e args          call function at e in place of current one
+    ret a               return a, or nothing if a is None
+    red d               read a number into d
+    wrt a               write a
+    """
+    _instruction_code = {
+        'mov': 0, 'opr': 1, 'odd': 2, 'gld': 3, 'gst': 4, 'jmp': 5, 'jeq': 6, 'jne': 7,
+        'jcf': 8, 'cal': 9, 'tcl': 10, 'ret': 11, 'red': 12, 'wrt': 13,
+
+        0: 'mov', 1: 'opr', 2: 'odd', 3: 'gld', 4: 'gst', 5: 'jmp', 6: 'jeq', 7: 'jne',
+        8: 'jcf', 9: 'cal', 10: 'tcl', 11: 'ret', 12: 'red', 13: 'wrt'
+    }
+
+    # Fields of an instruction holding a slot read, which may be a constant, keyed by instruction code.
+    # Arguments of 'cal' and 'tcl' are read too.
+    operand_fields = {
+        0: (2,), 1: (3, 4), 2: (2,), 4: (2,), 6: (2,), 7: (2,), 8: (2, 3), 11: (1,), 13: (1,)
+    }
+
+    @property
+    def table(self):
+        return self._table
+
+    @property
+    def next_line_num(self):
+        return len(self._table)
+
+    @property
+    def functions(self):
+        return self._functions
+
+    def __init__(self):
+        self._table = []
+        # Entrance instruction index of functions -> [function name, number of parameters, return void or not,
+        # initial frame]. The top-level code is at index 0.
+        self._functions = {}
+
+    @classmethod
+    def code(cls, ic):
+        """ Get the instruction code of an instruction name. """
+        if not isinstance(ic, str) or ic not in cls._instruction_code:
+            raise Exception('Instruction code error.')
+        return cls._instruction_code[ic]
+
+    # Set 'ins' as a return value so that missing value in 'ins' can be filled later.
+    def gen(self, ic, *args):
+        ins = [self.code(ic)] + list(args)
+        self._table.append(ins)
+        return ins
+
+    def add_func(self, name, param_num, return_void):
+        """ Record a function starting at next instruction. Its frame is set by 'set_frame' once generated. """
+        self._functions[len(self._table)] = [name, param_num, return_void, None]
+
+    def load(self, table, functions):
+        """ Replace the whole table and functions with ones kept before, like by DiskCache. """
+        self._table = table
+        self._functions = functions
+
+    def set_frame(self, entry, start, slots, consts):
+        """
+        Give constant slots their place after the 'slots' other slots of the function generated from instruction
+        'start' on, and set its initial frame.
+        consts: constants of the function, the k-th one being slot '-1 - k' in instructions until now.
+        """
+        for ins in self._table[start:]:
+            fields = self.operand_fields.get(ins[0], ())
+            for field in fields:
+                if ins[field] is not None and ins[field] < 0:
+                    ins[field] = slots - 1 - ins[field]
+            if ins[0] == self.code('cal') or ins[0] == self.code('tcl'):
+                args = ins[3] if ins[0] == self.code('cal') else ins[2]
+                args[:] = [slots - 1 - arg if arg < 0 else arg for arg in args]
+        self._functions[entry][3] = [0] * slots + consts
+
+    # Used when debugging. Print current instruction table.
+    def print_ins_table(self, to_screen=False, file_name='register code.txt'):
+        dir_name = 'instruction table'
+        if not os.path.isdir(dir_name):
+            os.mkdir(dir_name)
+        output_file = open(dir_name + '\\' + file_name, 'w')
+        for line_num, ins in enumerate(self._table):
+            if line_num in self._functions:
+                info = self._functions[line_num]
+                line = '# ' + info[0] + ', frame ' + str(info[3])
+                output_file.write(line + '\n')
+                if to_screen:
+                    print(line)
+            line = self._instruction_code[ins[0]] + '\t' + '\t'.join(str(arg) for arg in ins[1:])
+            output_file.write(line + '\n')
+            if to_screen:
+                print(str(line_num) + '\t' + line)
+        output_file.close()
+
+    # Execute instructions in the table with the given I/O.
+    def execute(self, io=None):
+        RegisterMachine(self, io).execute()
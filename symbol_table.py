@@ -1,12 +1,17 @@
 class SymbolTable:
-    def __init__(self, it):
+    # Identifiers are given by their ID from the token stream.
+    # names: text of identifiers by their ID, to show them. None if identifiers are given as text.
+    def __init__(self, names=None):
+        self._names = names
         self._funcDict = {}
-        self._insTable = it
         self._varNum = [0]
         self._varTable = []
         self._consTable = []
         self._funcTable = []
         self._curLayerNum = 0
+        # Identifier -> indices of its entries in constant table or variable table, in the same order.
+        self._consIndex = {}
+        self._varIndex = {}
 
     def __str__(self):
         res = 'constant table:\n'
@@ -17,9 +22,13 @@ class SymbolTable:
             res += str(i) + '\n'
         res += '\nfunc table:\n'
         for i in self._funcDict:
-            res += i + str(self._funcTable[self._funcDict[i]]) + '\n'
+            res += self.name(i) + str(self._funcTable[self._funcDict[i]]) + '\n'
         return res
 
+    def name(self, ident):
+        """ Get the text of an identifier. """
+        return ident if self._names is None else self._names[ident]
+
     def has_func(self, name):
         """ Tell if a function is in function table. """
         return name in self._funcDict
@@ -29,44 +38,28 @@ class SymbolTable:
 
     def const_idx(self, name, search_range):
         """ Tell if a constant is in constant table within specific range. Return index if true. """
-        cnt = 0
-        idx = len(self._consTable)
-        if idx == 0:
-            return -1
-        while idx > 0:
-            idx -= 1
-            if self._consTable[idx][0] == name \
-                    and (self._curLayerNum - self._consTable[idx][1] <= search_range or self._consTable[idx][1] == 0):
-                return cnt
-            cnt += 1
+        for idx in reversed(self._consIndex.get(name, ())):
+            if self._curLayerNum - self._consTable[idx][1] <= search_range or self._consTable[idx][1] == 0:
+                return len(self._consTable) - 1 - idx
         return -1
 
     def variable_idx(self, name, search_range):
-        """ Tell if a variable is in variable table within specific range. Return index if true."""
-        cnt = 0
-        idx = len(self._varTable)
-        if idx == 0:
-            return -1
-        while idx > 0:
-            idx -= 1
-            # if self._varTable[idx][0] == name \
-            #         and (self._curLayerNum - self._varTable[idx][1] <= search_range or self._varTable[idx][1] == 0):
-            #     return cnt
-            if self._varTable[idx][0] == name:
-                if self._curLayerNum - self._varTable[idx][1] <= search_range:
-                    return cnt
-                elif self._varTable[idx][1] == 0:
-                    return -1 - self._varTable[idx][2]
-            cnt += 1
+        """
+        Tell if a variable is in variable table within specific range. Return its address if true.
+        Address of a variable is its slot in the frame of current function, or '-2 - slot' for a global variable
+        used inside a function.
+        """
+        for idx in reversed(self._varIndex.get(name, ())):
+            if self._curLayerNum - self._varTable[idx][1] <= search_range:
+                return self._varTable[idx][2]
+            elif self._varTable[idx][1] == 0:
+                return -2 - self._varTable[idx][2]
         return -1
 
     def get_const_val(self, name):
         """ Get the value of a constant. """
-        idx = len(self._consTable)
-        while idx > 0:
-            idx -= 1
-            if self._consTable[idx][0] == name:
-                return self._consTable[idx][2]
+        if name in self._consIndex:
+            return self._consTable[self._consIndex[name][-1]][2]
 
     def add_func(self, name, param_list=list(), return_void=True):
         """
@@ -75,13 +68,13 @@ class SymbolTable:
                 Key:    Function name
                 Value:  Function number
         Function table(index number is function number):
-                parameter list | have return value or not | entrance instruction line number
+                parameter list | have return value or not
         """
         # Search all the constants and variable to ensure no identifier shares name with this new function.
         if self.has_func(name) or self.const_idx(name, 10086) != -1 or self.variable_idx(name, 10086) != -1:
             raise Exception("Identifier name already used before.")
         self._funcDict[name] = len(self._funcTable)
-        self._funcTable.append([param_list, return_void, self._insTable.next_line_num])
+        self._funcTable.append([param_list, return_void])
 
     def add_const(self, name, val, search_range):
         """
@@ -92,20 +85,27 @@ class SymbolTable:
         if self.has_func(name) or self.const_idx(name, search_range) != -1 \
                 or self.variable_idx(name, search_range) != -1:
             raise Exception("Identifier name already used before.")
+        self._consIndex.setdefault(name, []).append(len(self._consTable))
         self._consTable.append([name, self._curLayerNum, val])
 
     def add_var(self, name, search_range):
         """
         Add a variable into variable table.
         Variable table:
-                variable name | defined on which layer | variable number
+                variable name | defined on which layer | slot
+        Slot of a global variable is its index among all global variables. Slot of a local variable is its index
+        in the frame of current function, counted from the first parameter. Return the slot.
         """
         if self.has_func(name) or self.const_idx(name, search_range) != -1 \
                 or self.variable_idx(name, search_range) != -1:
             raise Exception("Identifier name already used before.")
+        slot = len(self._varTable)
+        if self._curLayerNum:
+            slot -= self._varNum[0]
         self._varNum[self._curLayerNum] += 1
-        self._varTable.append([name, self._curLayerNum, self._varNum[self._curLayerNum]])
-        self._insTable.gen('str', -1, 0)
+        self._varIndex.setdefault(name, []).append(len(self._varTable))
+        self._varTable.append([name, self._curLayerNum, slot])
+        return slot
 
     def new_layer(self, predefined_var=None):
         """
@@ -119,28 +119,27 @@ class SymbolTable:
 
     def pop(self):
         """
-        Pop a layer. Also pop all the constants and variables of that layer.
+        Pop a layer. Also pop all the constants and variables of that layer. Return the number of variables popped.
         """
         len_c = len(self._consTable) - 1
         len_v = len(self._varTable) - 1
-        self._insTable.gen('opr', -1, self._varNum[self._curLayerNum])
+        var_num = self._varNum[self._curLayerNum]
         while self._consTable and self._consTable[len_c][1] == self._curLayerNum:
-            self._consTable.pop()
+            self._unindex(self._consIndex, self._consTable.pop()[0])
             len_c -= 1
         while self._varTable and self._varTable[len_v][1] == self._curLayerNum:
-            self._varTable.pop()
+            self._unindex(self._varIndex, self._varTable.pop()[0])
             len_v -= 1
         self._varNum.pop()
         self._curLayerNum -= 1
+        return var_num
 
-    def ret(self, num_layer_being_pop):
-        """
-        Quit current function and dump all local variable and constants.
-        Called when a 'return' is found.
-        """
-        for i in range(num_layer_being_pop):
-            self._insTable.gen('opr', -1, self._varNum[self._curLayerNum - i])
-        self._insTable.gen('opr', 0, 0)
+    # Drop the last entry of an identifier from an index.
+    @staticmethod
+    def _unindex(index, name):
+        index[name].pop()
+        if not index[name]:
+            del index[name]
 
     def clear(self):
         """
@@ -153,4 +152,6 @@ class SymbolTable:
             self._consTable.pop()
         while self._varTable:
             self._varTable.pop()
+        self._consIndex.clear()
+        self._varIndex.clear()
         self._varNum.pop()
@@ -3,22 +3,128 @@ Syntax analysis module.
 """
 from map_info import MapInfo
 from symbol_table import SymbolTable
-from lexical_analysis import LexicalAnalyst
+from lexical_analysis import LexicalAnalyst, RegexLexicalAnalyst, MappedLexicalAnalyst, LineCachedLexicalAnalyst
+from compile_cache import CachedFunction
+from token_stream import TokenStream
 from instruction_table import InstructionTable
+from instruction_fusion import InstructionFuser
+from peephole_optimization import PeepholeOptimizer
+from syntax_tree import Number, Variable, BinaryOp, Odd, SelfOp, Call, VarDecl, Assign, Read, Write, If, While, \
+    DoWhile, Repeat, For, Return, Block, Function, Program
+from pass_manager import PassManager
+from tree_optimization import Inliner, ConstantFolder, LoopInvariantMover, StrengthReducer
+from code_generation import CodeGenerator
+from register_table import RegisterTable
+from register_generation import RegisterGenerator
 
 
 class SyntaxAnalyst:
-    def __init__(self, input_file_name):
+    """
+    Parse a source file into a syntax tree, checking names with a symbol table, run the tree passes registered in
+    'passes' on it, and generate instructions from it.
+    """
+    # Available lexical analysts.
+    # char:  read the source file a char at a time.
+    # regex: split the whole source file into tokens with a regular expression at once.
+    # mmap:  find tokens one at a time in a memory map of the source file, as offsets into the map.
+    lexers = {'char': LexicalAnalyst, 'regex': RegexLexicalAnalyst, 'mmap': MappedLexicalAnalyst}
+
+    # Available code generation backends.
+    # stack:    instructions of the stack machine in 'it', run by Executor.
+    # register: three-address instructions on frame slots in 'rt', run by RegisterMachine. Neither fusion nor
+    #           peephole optimization nor incremental analysis applies to them.
+    backends = ('stack', 'register')
+
+    # fuse:  rewrite common instruction sequences into superinstructions after analysis.
+    # peephole: remove jumps and instructions never run after analysis, see PeepholeOptimizer.
+    # cache: CompileCache kept from analysing the same file before, to analyse it incrementally. Lines are then split
+    #        by LineCachedLexicalAnalyst whatever the lexer is, and functions unchanged are taken from the cache.
+    # inline_budget: most nodes in the body of a function inlined by Inliner, 0 to inline nothing.
+    # disk_cache: DiskCache to take the finished table from without reading the source file, if it was analysed with
+    #             the same options before, and to store it in otherwise. Passes are taken to be the ones registered
+    #             here.
+    def __init__(self, input_file_name, fuse=False, lexer='char', cache=None, peephole=True, backend='stack',
+                 inline_budget=24, disk_cache=None):
+        if lexer not in self.lexers:
+            raise Exception('Unknown lexical analyst \'' + str(lexer) + '\'.')
+        if backend not in self.backends:
+            raise Exception('Unknown backend \'' + str(backend) + '\'.')
+        if backend == 'register' and (fuse or cache is not None):
+            raise Exception('Register backend supports neither fusion nor incremental analysis.')
+        if cache is not None and disk_cache is not None:
+            raise Exception('Incremental analysis can not be used with a disk cache.')
+        self._backend = backend
+        self._fuse = fuse
+        self._peephole = peephole
         self._seq_layer = -1
-        self.la = LexicalAnalyst(input_file_name)
+        self._cache = cache
         self.it = InstructionTable()
-        self.st = SymbolTable(self.it)
+        self.rt = RegisterTable()
+        # Syntax tree of the last analysis, after passes.
+        self.tree = None
+        # Number of instructions removed by peephole optimization and eliminated by fusion.
+        self.removed = 0
+        self.eliminated = 0
+        self._disk_cache = disk_cache
+        self._disk_key = None
+        self._loaded = False
+        if disk_cache is not None:
+            self._disk_key = disk_cache.key(input_file_name, (backend, fuse, peephole, inline_budget))
+            data = disk_cache.load(self._disk_key, self._entry_valid)
+            if data is not None:
+                # The table is all that is needed to run, so that the source file is not even lexed.
+                table, functions, self.removed, self.eliminated = data
+                (self.rt if backend == 'register' else self.it).load(table, functions)
+                self._loaded = True
+                return
+        if cache is None:
+            self.la = TokenStream(self.lexers[lexer](input_file_name))
+        else:
+            self.la = TokenStream(LineCachedLexicalAnalyst(input_file_name, cache.lines))
+        self.st = SymbolTable(self.la.names)
         self.has_return = False
         self._return_void = False
-        self._main_ins = None
+        self._has_main = False
+        # Without division every value is an integer, so that 'x + 0' and 'x * 0' can be simplified too.
+        self._int_only = MapInfo.mmap['oprDevd'] not in self.la
+        self.passes = PassManager()
+        self._inliner = Inliner(self._int_only, inline_budget)
+        self.passes.register('inline', self._inliner)
+        self.passes.register('fold', ConstantFolder(self._int_only))
+        self.passes.register('licm', LoopInvariantMover(self._int_only))
+        self.passes.register('strength', StrengthReducer(self._int_only))
+        # (name, number of parameters, return void or not) of functions defined so far, symbols and functions
+        # defined before of every function analysed, and symbols of every function, for incremental analysis.
+        self._defined = ()
+        self._keys = {}
+        self._symbols = {}
 
     # Main loop
-    def execute(self):
+    def execute(self, engine='switch', io=None, profile=False):
+        self.analyse()
+        if self._backend == 'register':
+            if profile:
+                raise Exception('Register backend can not be profiled.')
+            self.rt.print_ins_table(input('Print instruction table to screen?(Y / N):\n') == 'Y')
+            print()
+            self.rt.execute(io)
+            return
+        if self._fuse:
+            print('Superinstruction fusion eliminated ' + str(self.eliminated) + ' instructions.')
+        self.it.print_ins_table(input('Print instruction table to screen?(Y / N):\n') == 'Y')
+        print()
+        self.it.execute(engine, io, profile)
+
+    # Tell if an entry of the disk cache is made like the ones stored by 'analyse'.
+    @staticmethod
+    def _entry_valid(data):
+        return isinstance(data, tuple) and len(data) == 4 and isinstance(data[0], list) \
+            and isinstance(data[1], dict) and isinstance(data[2], int) and isinstance(data[3], int)
+
+    # Analyse the whole source file. Return the finished instruction table, or register table of register backend.
+    def analyse(self):
+        if self._loaded:
+            return self.rt if self._backend == 'register' else self.it
         self.la.getsym()
 
         while self.la.sym_type == MapInfo.mmap['const']:
@@ -27,28 +133,47 @@ class SyntaxAnalyst:
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[';']]:
                 raise Exception('Semicolon missing. ')
             self.la.getsym()
+        variables = []
         while self.la.sym_type == MapInfo.mmap['ident']:
-            self._var_asm()
+            variables.extend(self._var_asm())
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[';']]:
                 raise Exception('Semicolon missing. ')
             self.la.getsym()
-        self._main_ins = self.it.gen('cal', None, self.it.next_line_num + 1)
-        end_ins = self.it.gen('jmp', 0, None)
+        if self._cache is not None:
+            # Functions analysed with other globals can not be reused.
+            global_symbols = (self._int_only, self.la.symbols(1, self.la.mark()))
+            if global_symbols != self._cache.globals:
+                self._cache.globals = global_symbols
+                self._cache.functions = {}
+            self._cache.reused = self._cache.analysed = 0
+        functions = []
         while self.la.sym_type == MapInfo.mmap['void'] or self.la.sym_type == MapInfo.mmap['int']:
             self._return_void = self.la.sym_type == MapInfo.mmap['void']
             self.la.getsym()
-            self._func()
+            functions.append(self._func())
         if self.la.sym_type != MapInfo.mmap[None]:
             raise Exception('Fatal error in main analysis loop. ')
-        if self._main_ins[1] is None:
+        if not self._has_main:
             raise Exception('Function \'main\' missing.')
         self.st.clear()
-        end_ins[2] = self.it.next_line_num
 
         self.la.close_input()
-        self.it.print_ins_table(input('Print instruction table to screen?(Y / N):\n') == 'Y')
-        print()
-        self.it.execute()
+        self.tree = self.passes.run(Program(variables, functions))
+        if self._backend == 'register':
+            table = RegisterGenerator(self.rt).generate(self.tree)
+        else:
+            generator = CodeGenerator(self.it)
+            generator.generate(self.tree)
+            if self._cache is not None:
+                self._keep(generator.spans)
+            if self._peephole:
+                self.removed = PeepholeOptimizer(self.it).optimize()
+            if self._fuse:
+                self.eliminated = InstructionFuser(self.it).fuse()
+            table = self.it
+        if self._disk_cache is not None:
+            self._disk_cache.store(self._disk_key, (table.table, table.functions, self.removed, self.eliminated))
+        return table
 
     # Functions handler.
     def _func(self):
@@ -71,8 +196,10 @@ class SyntaxAnalyst:
         # Format error. Should be a identifier
         if self.la.sym_type != MapInfo.mmap['ident']:
             raise Exception('Format error.')
+        # Position of the return type.
+        start = self.la.mark() - 1
         param = []
-        name = self.la.cur_sym
+        name = self.la.sym_id
         self.has_return = False
         self.la.getsym()
         # Format error. Should be a '('
@@ -86,7 +213,7 @@ class SyntaxAnalyst:
                 # Format error. Should be a identifier
                 if self.la.sym_type != MapInfo.mmap['ident']:
                     raise Exception('Format error.')
-                param.append(self.la.cur_sym)
+                param.append(self.la.sym_id)
                 self.la.getsym()
                 if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[',']]:
                     break
@@ -97,15 +224,59 @@ class SyntaxAnalyst:
             raise Exception('Format error.')
         self.la.getsym()
         self.st.add_func(name, param, self._return_void)
+        text = self.st.name(name)
+        param_names = [self.st.name(i) for i in param]
+        defined = self._defined
+        self._defined += ((text, len(param), self._return_void),)
+        if text == 'main':
+            self._has_main = True
+        if self._cache is not None:
+            cached = self._reuse(text, start, defined)
+            if cached is not None:
+                self._symbols[text] = cached.symbols
+                return Function(text, param_names, self._return_void, None, cached)
         self.st.new_layer(param[::-1])
-        if name == 'main':
-            self._main_ins[1] = self.it.next_line_num
-            if not self._return_void:
-                raise Exception('Main function should not return anything.')
-        self._stat_seq()
+        if text == 'main' and not self._return_void:
+            raise Exception('Main function should not return anything.')
+        body = self._stat_seq()
         if not self._return_void and not self.has_return:
-            raise Exception('Return value is required in function \'' + name + '\'')
+            raise Exception('Return value is required in function \'' + text + '\'')
         # Error if no return
+        if self._cache is not None:
+            self._keys[text] = (self.la.symbols(start, self.la.mark()), defined)
+            self._symbols[text] = self._keys[text][0]
+            self._cache.analysed += 1
+        return Function(text, param_names, self._return_void, body)
+
+    # Take a function from the cache if its symbols, the functions defined before it and the functions its code
+    # depends on by inlining are unchanged. Return the CachedFunction with its symbols skipped, or None.
+    def _reuse(self, name, start, defined):
+        func = self._cache.functions.get(name)
+        if func is None or func.defined != defined \
+                or any(self._symbols.get(callee) != symbols for callee, symbols in func.depends.items()) \
+                or self.la.symbols(start, start + len(func.symbols)) != func.symbols:
+            return None
+        self.la.reset(start + len(func.symbols))
+        self._cache.reused += 1
+        return func
+
+    # Keep every function in the cache, with its instructions before fusion.
+    # spans: (first, last + 1) instruction index of every function.
+    def _keep(self, spans):
+        functions = {}
+        for func in self.tree.functions:
+            if func.cached is not None:
+                functions[func.name] = func.cached
+                continue
+            entry, end = spans[func.name]
+            code = [list(ins) for ins in self.it.table[entry:end]]
+            calls = {idx: self.it.functions[ins[1]][0] for idx, ins in enumerate(code)
+                     if ins[0] in (InstructionTable.code('cal'), InstructionTable.code('tcl'))}
+            symbols, defined = self._keys[func.name]
+            depends = {callee: self._symbols[callee] for callee in self._inliner.depends.get(func.name, ())}
+            functions[func.name] = CachedFunction(symbols, defined, code, entry, calls, depends,
+                                                  self._inliner.bodies.get(func.name))
+        self._cache.functions = functions
 
     # Statement sequences handler.
     def _stat_seq(self):
@@ -129,8 +300,9 @@ class SyntaxAnalyst:
             if self._seq_layer:
                 self.st.new_layer()
             self.la.getsym()
+            statements = []
             while True:
-                self._statement()
+                statements.extend(self._statement())
                 # ';' Semicolon checking
                 if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[';']]:
                     break
@@ -138,15 +310,15 @@ class SyntaxAnalyst:
             # Format error. Should be a '}'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['}']]:
                 raise Exception('Format error.')
-            self.st.pop()
-            if not self._seq_layer:
-                self.it.gen('opr', 0, 0)
+            var_num = self.st.pop()
+            block = Block(statements, var_num if self._seq_layer > 0 else None)
             self._seq_layer -= 1
 
         # Format error. Should be a '{'
         else:
             raise Exception('Format error.')
         self.la.getsym()
+        return block
 
     # Statement handler
     def _statement(self):
@@ -190,78 +362,82 @@ class SyntaxAnalyst:
 
         Return statement:
         return expression
+
+        Return a list of statements, which is empty for constant definitions and empty statements.
         """
         # Const assignment.
         if self.la.sym_type == MapInfo.mmap['const']:
             self.la.getsym()
             self._const_asm()
+            return []
 
         # Variable assignment or value giving.
         elif self.la.sym_type == MapInfo.mmap['ident']:
-            var_idx = self.st.variable_idx(self.la.cur_sym, self._seq_layer)
+            var_idx = self.st.variable_idx(self.la.sym_id, self._seq_layer)
             # new variable assignment
             if var_idx == -1:
-                self._var_asm()
+                return self._var_asm()
             # value giving
             else:
+                name = self.st.name(self.la.sym_id)
                 self.la.getsym()
                 # Format error. Should be a '='
                 if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['=']]:
                     raise Exception('Format error.')
                 self.la.getsym()
-                self._exp()
-                self.it.gen('str', var_idx, 0)
+                return [Assign(name, var_idx, self._exp())]
 
         # Read statement.
         elif self.la.sym_type == MapInfo.mmap['read']:
             self.la.getsym()
+            variables = []
             while True:
                 # Format error. Should be a identifier
                 if self.la.sym_type != MapInfo.mmap['ident']:
                     raise Exception('Format error.')
-                name = self.la.cur_sym
+                name = self.la.sym_id
                 is_variable = self.st.variable_idx(name, self._seq_layer)
                 is_constant = self.st.const_idx(name, self._seq_layer)
                 if is_constant != -1:
                     raise Exception('Constant can\'t be reassigned.')
                 if is_variable == -1:
                     raise Exception('Can\'t be used before defined.')
-                self.it.gen('opr', 14, is_variable)
+                variables.append(Variable(self.st.name(name), is_variable))
                 self.la.getsym()
                 # Read statement over.
                 if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[',']]:
                     break
                 self.la.getsym()
+            return [Read(variables)]
 
         # Write statement.
         elif self.la.sym_type == MapInfo.mmap['write']:
             self.la.getsym()
+            values = []
             while True:
-                self._exp()
-                self.it.gen('opr', 15, 0)
+                values.append(self._exp())
                 # Write statement over.
                 if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[',']]:
                     break
                 self.la.getsym()
+            return [Write(values)]
 
         # If statement.
         elif self.la.sym_type == MapInfo.mmap['if']:
-            end_ins = []
+            conditions = []
+            blocks = []
             while True:
                 self.la.getsym()
-                self._exp()
-                jmp_ins = self.it.gen('jpc', 0, None)
-                self._stat_seq()
-                end_ins.append(self.it.gen('jmp', 0, None))
-                jmp_ins[2] = self.it.next_line_num
+                conditions.append(self._exp())
+                blocks.append(self._stat_seq())
                 if self.la.sym_type != MapInfo.mmap['elif']:
                     break
 
+            orelse = None
             if self.la.sym_type == MapInfo.mmap['else']:
                 self.la.getsym()
-                self._stat_seq()
-            for i in range(len(end_ins)):
-                end_ins[i][2] = self.it.next_line_num
+                orelse = self._stat_seq()
+            return [If(conditions, blocks, orelse)]
 
         # While statement
         elif self.la.sym_type == MapInfo.mmap['while']:
@@ -270,22 +446,17 @@ class SyntaxAnalyst:
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['(']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            jmp_back_idx = self.it.next_line_num
-            self._exp()
-            jmp_out_ins = self.it.gen('jpc', 0, None)
+            condition = self._exp()
             # Format error. Should be a ')'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            self._stat_seq()
-            self.it.gen('jmp', 0, jmp_back_idx)
-            jmp_out_ins[2] = self.it.next_line_num
+            return [While(condition, self._stat_seq())]
 
         # Repeat until statement
         elif self.la.sym_type == MapInfo.mmap['repeat']:
             self.la.getsym()
-            jmp_back_idx = self.it.next_line_num
-            self._stat_seq()
+            body = self._stat_seq()
             # Format error. Should be a 'while'
             if self.la.sym_type != MapInfo.mmap['until']:
                 raise Exception('Format error.')
@@ -294,20 +465,17 @@ class SyntaxAnalyst:
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['(']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            self._exp()
+            condition = self._exp()
             # Format error. Should be a ')'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
                 raise Exception('Format error.')
-            jmp_out_ins = self.it.gen('jpc', 1, None)
-            self.it.gen('jmp', 0, jmp_back_idx)
-            jmp_out_ins[2] = self.it.next_line_num
             self.la.getsym()
+            return [Repeat(body, condition)]
 
         # Do while statement
         elif self.la.sym_type == MapInfo.mmap['do']:
             self.la.getsym()
-            jmp_back_idx = self.it.next_line_num
-            self._stat_seq()
+            body = self._stat_seq()
             # Format error. Should be a 'while'
             if self.la.sym_type != MapInfo.mmap['while']:
                 raise Exception('Format error.')
@@ -316,14 +484,12 @@ class SyntaxAnalyst:
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['(']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            self._exp()
+            condition = self._exp()
             # Format error. Should be a ')'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
                 raise Exception('Format error.')
-            jmp_out_ins = self.it.gen('jpc', 0, None)
-            self.it.gen('jmp', 0, jmp_back_idx)
-            jmp_out_ins[2] = self.it.next_line_num
             self.la.getsym()
+            return [DoWhile(body, condition)]
 
         # For statement
         elif self.la.sym_type == MapInfo.mmap['for']:
@@ -332,49 +498,42 @@ class SyntaxAnalyst:
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['(']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            self._statement()
+            init = self._statement()
             # Format error. Should be a ';'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[';']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            back_to_judge = self.it.next_line_num
-            self._exp()
-            jmp_out_ins = self.it.gen('jpc', 0, None)
-            jmp_to_loop = self.it.gen('jmp', 0, None)
+            condition = self._exp()
             # Format error. Should be a ';'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[';']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            step_stat = self.it.next_line_num
-            self._statement()
-            self.it.gen('jmp', 0, back_to_judge)
+            step = self._statement()
             # Format error. Should be a ')'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
                 raise Exception('Format error.')
             self.la.getsym()
-            jmp_to_loop[2] = self.it.next_line_num
-            self._stat_seq()
-            self.it.gen('jmp', 0, step_stat)
-            jmp_out_ins[2] = self.it.next_line_num
+            return [For(init, condition, step, self._stat_seq())]
 
         # Return statement
         elif self.la.sym_type == MapInfo.mmap['return']:
             self.has_return = True
             self.la.getsym()
+            value = None
             if not self._return_void:
-                self._sp_exp()
-            self.st.ret(self._seq_layer + 1)
+                value = self._sp_exp()
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['}']]:
                 raise Exception('Sequence should end after return.')
+            return [Return(value)]
 
         # Function calling
         elif self.la.sym_type == MapInfo.mmap['func']:
-            self._function_call_handler(True)
+            return [self._function_call_handler(True)]
 
         # Empty statement
         elif self.la.sym_type == MapInfo.mmap[MapInfo.ssym['}']] or \
                 self.la.sym_type == MapInfo.mmap[MapInfo.ssym[';']]:
-                return
+                return []
 
         # Format error. Should be a start of any kind of statement.
         else:
@@ -392,7 +551,7 @@ class SyntaxAnalyst:
         Examples:
         apple > boy; 1 + 1 >= 2; 2 ODD...
         """
-        self._sp_exp()
+        left = self._sp_exp()
         # Not just an identifier or a number
         if self.la.cur_sym in MapInfo.coopr:
             opr_num = 3
@@ -400,14 +559,12 @@ class SyntaxAnalyst:
                 if self.la.cur_sym == MapInfo.coopr[i]:
                     opr_num += i
                     break
+            self.la.getsym()
             # 'ODD' operation
             if opr_num == 9:
-                self.it.gen('opr', opr_num, 0)
-                self.la.getsym()
-                return
-            self.la.getsym()
-            self._sp_exp()
-            self.it.gen('opr', opr_num, 0)
+                return Odd(left)
+            return BinaryOp(opr_num, left, self._sp_exp())
+        return left
 
     # Simple expression
     def _sp_exp(self):
@@ -418,15 +575,15 @@ class SyntaxAnalyst:
         Examples:
         1 + 1; 3 - 4...
         """
-        self._term()
+        left = self._term()
         # Not just an identifier or a number
         while self.la.cur_sym in MapInfo.amopr:
             opr_num = 1
             if self.la.cur_sym == '+':
                 opr_num = 2
             self.la.getsym()
-            self._term()
-            self.it.gen('opr', opr_num, 0)
+            left = BinaryOp(opr_num, left, self._term())
+        return left
 
     # Term expression
     def _term(self):
@@ -437,7 +594,7 @@ class SyntaxAnalyst:
         Examples:
         2 * 2; 3 XOR 1...
         """
-        self._factor()
+        left = self._factor()
         # Not just an identifier or a number
         while self.la.cur_sym in MapInfo.mulopr:
             opr_num = 10
@@ -446,8 +603,8 @@ class SyntaxAnalyst:
                     opr_num += i
                     break
             self.la.getsym()
-            self._factor()
-            self.it.gen('opr', opr_num, 0)
+            left = BinaryOp(opr_num, left, self._factor())
+        return left
 
     # Factor expression
     def _factor(self):
@@ -464,44 +621,44 @@ class SyntaxAnalyst:
         # (simple-exp)
         if self.la.sym_type == MapInfo.mmap[MapInfo.ssym['(']]:
             self.la.getsym()
-            self._sp_exp()
+            node = self._sp_exp()
             # Format error. Should be a ')'
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
                 raise Exception('Format error.')
             self.la.getsym()
+            return node
 
         # Function
         elif self.la.sym_type == MapInfo.mmap['func']:
-            self._function_call_handler(False)
+            return self._function_call_handler(False)
 
         # ident++ or ident-- or just an identifier
         elif self.la.sym_type == MapInfo.mmap['ident']:
-            name = self.la.cur_sym
-            is_constant = self.st.const_idx(name, self._seq_layer)
+            name = self.la.sym_id
             is_variable = self.st.variable_idx(name, self._seq_layer)
+            # A constant is only looked for if it could be used or a self-operator follows.
+            is_constant = -1
+            if is_variable == -1 or self.la.peek() in (MapInfo.mmap['selfPls'], MapInfo.mmap['selfMin']):
+                is_constant = self.st.const_idx(name, self._seq_layer)
             if is_variable != -1:
-                self.it.gen('lod', is_variable, 0)
+                node = Variable(self.st.name(name), is_variable)
             elif is_constant != -1:
-                self.it.gen('lit', 0, self.st.get_const_val(name))
+                node = Number(self.st.get_const_val(name))
             else:
                 raise Exception('Identifier not defined.')
             self.la.getsym()
             if self.la.cur_sym in MapInfo.selfopr:
                 if is_constant != -1:
                     raise Exception('Self-operator can\'t be used on constants.')
-                self.it.gen('lod', is_variable, 0)
-                if self.la.cur_sym == '++':
-                    self.it.gen('lit', 0, 1)
-                else:
-                    self.it.gen('lit', 0, -1)
-                self.it.gen('opr', 2, 0)
-                self.it.gen('str', is_variable, 0)
+                node = SelfOp(self.st.name(name), is_variable, 1 if self.la.cur_sym == '++' else -1, False)
                 self.la.getsym()
+            return node
 
         # number
         elif self.la.sym_type == MapInfo.mmap['number']:
-            self.it.gen('lit', 0, self.la.cur_num)
+            node = Number(self.la.cur_num)
             self.la.getsym()
+            return node
 
         # -ident or +ident
         elif self.la.cur_sym in MapInfo.amopr:
@@ -509,10 +666,10 @@ class SyntaxAnalyst:
             self.la.getsym()
             if self.la.sym_type not in [MapInfo.mmap['ident'], MapInfo.mmap['number'], MapInfo.mmap['func']]:
                 raise Exception('Syntax Error.')
-            self._factor()
+            node = self._factor()
             if self_minus:
-                self.it.gen('lit', 0, -1)
-                self.it.gen('opr', 4, 0)
+                return BinaryOp(4, node, Number(-1))
+            return node
 
         # ++ident or --ident
         elif self.la.cur_sym in MapInfo.selfopr:
@@ -524,21 +681,13 @@ class SyntaxAnalyst:
             # Format error. Should be a identifier
             if self.la.sym_type != MapInfo.mmap['ident']:
                 raise Exception('Format error.')
-            name = self.la.cur_sym
+            name = self.la.sym_id
             is_constant = self.st.const_idx(name, self._seq_layer)
             is_variable = self.st.variable_idx(name, self._seq_layer)
             if is_constant != -1 or is_variable == -1:
                 raise Exception('Self-operator can only be used on variables.')
-            self.it.gen('lod', is_variable, 0)
-            if self_opr is not None:
-                if self_opr:
-                    self.it.gen('lit', 0, 1)
-                else:
-                    self.it.gen('lit', 0, -1)
-                self.it.gen('opr', 2, 0)
-                self.it.gen('str', is_variable, 0)
-                self.it.gen('lod', is_variable, 0)
             self.la.getsym()
+            return SelfOp(self.st.name(name), is_variable, 1 if self_opr else -1, True)
 
         else:
             raise Exception('Format error.')
@@ -549,8 +698,8 @@ class SyntaxAnalyst:
         # Format error. Should be a identifier
         if self.la.sym_type != MapInfo.mmap['ident']:
             raise Exception('Format error.')
-        param_len = 0
-        name = self.la.cur_sym
+        args = []
+        name = self.la.sym_id
         if not self.st.has_func(name):
             raise Exception('Function not defined.')
         func_info = self.st.func_info(name)
@@ -564,41 +713,39 @@ class SyntaxAnalyst:
         # For none empty list.
         if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
             while True:
-                self._sp_exp()
-                param_len += 1
+                args.append(self._sp_exp())
                 if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[',']]:
                     break
                 self.la.getsym()
-        if param_len != len(func_info[0]):
+        if len(args) != len(func_info[0]):
             raise Exception('Parameter number is not correct, ' + str(len(func_info[0]))
-                            + 'needed, ' + str(param_len) + ' given.')
+                            + 'needed, ' + str(len(args)) + ' given.')
         # Format error. Should be a ')'
         if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[')']]:
             raise Exception('Format error.')
-        self.it.gen('cal', func_info[2], self.it.next_line_num + 1)
         self.la.getsym()
+        return Call(self.st.name(name), args)
 
-    # Variable assignment function
+    # Variable assignment function. Return a VarDecl of every variable.
     def _var_asm(self):
+        variables = []
         while True:
             # Format error. Should be a identifier
             if self.la.sym_type != MapInfo.mmap['ident']:
                 raise Exception('Format error.')
-            name = self.la.cur_sym
+            name = self.la.sym_id
             self.la.getsym()
 
-            # Initialize the variable
+            # Initialize the variable. If the value is not given, make it 0.
+            init = None
             if self.la.sym_type == MapInfo.mmap[MapInfo.ssym['=']]:
                 self.la.getsym()
-                self._sp_exp()
-            elif self.la.sym_type == MapInfo.mmap[MapInfo.ssym[',']]\
-                    or self.la.sym_type == MapInfo.mmap[MapInfo.ssym[';']]:
-                # If the value is not given, make it 0.
-                self.it.gen('lit', 0, 0)
+                init = self._sp_exp()
 
             self.st.add_var(name, max(0, self._seq_layer))
+            variables.append(VarDecl(self.st.name(name), init))
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym[',']]:
-                return
+                return variables
             self.la.getsym()
 
     # Constant assignment function
@@ -607,7 +754,7 @@ class SyntaxAnalyst:
             # Format error. Should be a identifier
             if self.la.sym_type != MapInfo.mmap['ident']:
                 raise Exception('Format error.')
-            name = self.la.cur_sym
+            name = self.la.sym_id
             self.la.getsym()
             # Format error. Should be a '='
             if self.la.sym_type != MapInfo.mmap[MapInfo.ssym['=']]:
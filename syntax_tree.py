@@ -0,0 +1,206 @@
+"""
+Syntax tree module.
+
+Nodes built by SyntaxAnalyst and turned into instructions by CodeGenerator. Names are already resolved when a tree
+is built: variables carry their address, constants are turned into numbers, and a function call carries the name
+of a function defined before.
+"""
+
+
+class Node:
+    # Attributes holding a child node, a list of child nodes, or None.
+    fields = ()
+
+    def children(self):
+        """ Get child nodes in order. """
+        res = []
+        for field in self.fields:
+            val = getattr(self, field)
+            if isinstance(val, list):
+                res.extend(val)
+            elif val is not None:
+                res.append(val)
+        return res
+
+    def __repr__(self):
+        args = [key + '=' + repr(val) for key, val in self.__dict__.items()]
+        return type(self).__name__ + '(' + ', '.join(args) + ')'
+
+
+# Expressions, leaving one value on data stack.
+
+class Number(Node):
+    """ A number, or a constant. """
+    def __init__(self, value):
+        self.value = value
+
+
+class Variable(Node):
+    """ Value of a variable. address: slot in current frame, or '-2 - index' for a global variable. """
+    def __init__(self, name, address):
+        self.name = name
+        self.address = address
+
+
+class BinaryOp(Node):
+    """ Operation of code 'opr' (see Executor) on two values, 'left opr right'. """
+    fields = ('left', 'right')
+
+    def __init__(self, opr, left, right):
+        self.opr = opr
+        self.left = left
+        self.right = right
+
+
+class Odd(Node):
+    """ 1 if a value is odd, or 0. """
+    fields = ('operand',)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+
+class SelfOp(Node):
+    """
+    Add 'delta' to a variable. The value is the new one for '++x', or the old one for 'x++'.
+    """
+    def __init__(self, name, address, delta, prefix):
+        self.name = name
+        self.address = address
+        self.delta = delta
+        self.prefix = prefix
+
+
+class Call(Node):
+    """ Call a function. Also a statement when the function returns void. """
+    fields = ('args',)
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+# Statements.
+
+class VarDecl(Node):
+    """ Define a variable in current layer, with the value of 'init', or 0 if it is None. """
+    fields = ('init',)
+
+    def __init__(self, name, init):
+        self.name = name
+        self.init = init
+
+
+class Assign(Node):
+    fields = ('value',)
+
+    def __init__(self, name, address, value):
+        self.name = name
+        self.address = address
+        self.value = value
+
+
+class Read(Node):
+    """ Read a number into each variable. """
+    fields = ('variables',)
+
+    def __init__(self, variables):
+        self.variables = variables
+
+
+class Write(Node):
+    fields = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+
+class If(Node):
+    """ Run the block of the first condition being true, or 'orelse' (may be None) if none is. """
+    fields = ('conditions', 'blocks', 'orelse')
+
+    def __init__(self, conditions, blocks, orelse):
+        self.conditions = conditions
+        self.blocks = blocks
+        self.orelse = orelse
+
+
+class While(Node):
+    fields = ('condition', 'body')
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+
+
+class DoWhile(Node):
+    fields = ('body', 'condition')
+
+    def __init__(self, body, condition):
+        self.body = body
+        self.condition = condition
+
+
+class Repeat(Node):
+    """ Run body until the condition is true. """
+    fields = ('body', 'condition')
+
+    def __init__(self, body, condition):
+        self.body = body
+        self.condition = condition
+
+
+class For(Node):
+    """ init, step: lists of statements, empty for empty statements. """
+    fields = ('init', 'condition', 'step', 'body')
+
+    def __init__(self, init, condition, step, body):
+        self.init = init
+        self.condition = condition
+        self.step = step
+        self.body = body
+
+
+class Return(Node):
+    """ Return from a function, with a value unless it returns void. """
+    fields = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Block(Node):
+    """
+    Statement sequence in '{}'.
+    release: number of variables defined in it, dropped at its end. None for the outermost block of a function,
+             whose frame is dropped as a whole when returning.
+    """
+    fields = ('statements',)
+
+    def __init__(self, statements, release):
+        self.statements = statements
+        self.release = release
+
+
+class Function(Node):
+    """
+    A function definition. Parameters are the first slots of its frame.
+    cached: CachedFunction taken from a CompileCache instead of analysing the function again. 'body' is None then.
+    """
+    fields = ('body',)
+
+    def __init__(self, name, params, return_void, body, cached=None):
+        self.name = name
+        self.params = params
+        self.return_void = return_void
+        self.body = body
+        self.cached = cached
+
+
+class Program(Node):
+    """ Global variables (VarDecl), defined in order before 'main' is called, and functions. """
+    fields = ('variables', 'functions')
+
+    def __init__(self, variables, functions):
+        self.variables = variables
+        self.functions = functions
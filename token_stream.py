@@ -0,0 +1,117 @@
+"""
+Token stream module.
+"""
+from array import array
+from map_info import MapInfo
+
+
+class TokenStream:
+    """
+    All symbols of a source file, taken from a lexical analyst at once and kept in compact arrays: symbol type,
+    index into a table of symbols and names, index into a table of numbers, and line number of every symbol.
+    The index of a symbol or name is its ID: every distinct identifier and keyword of the source file gets a small
+    integer, so that names can be told apart without comparing text.
+    What the lexical analyst shows after each 'getsym' is kept as it is, so that the parser sees the same symbols
+    through the same interface, plus random access:
+    peek(k):    symbol type k symbols ahead, 'peek(0)' being the current one.
+    mark():     current position.
+    reset(pos): go back (or forward) to a position from 'mark'.
+    """
+    @property
+    def cur_num(self):
+        return self._numbers[self._num_idx[self._pos]]
+
+    @property
+    def cur_sym(self):
+        return self._names[self._name_idx[self._pos]]
+
+    @property
+    def sym_id(self):
+        return self._name_idx[self._pos]
+
+    @property
+    def names(self):
+        """ Text of symbols and names by their ID. """
+        return self._names
+
+    @property
+    def sym_type(self):
+        return self._types[self._pos]
+
+    @property
+    def line_num(self):
+        return self._lines[self._pos]
+
+    def __init__(self, la):
+        self._types = array('i')
+        self._name_idx = array('i')
+        self._num_idx = array('i')
+        self._lines = array('i')
+        self._names = [None]
+        self._numbers = [0]
+        name_idx = {None: 0}
+        num_idx = {0: 0}
+        # Position 0, before the first 'getsym'.
+        self._types.append(0 if la.sym_type is None else la.sym_type)
+        self._name_idx.append(0)
+        self._num_idx.append(0)
+        self._lines.append(0)
+        getsym = la.getsym
+        append_type = self._types.append
+        append_name = self._name_idx.append
+        append_num = self._num_idx.append
+        append_line = self._lines.append
+        sym_type = None
+        while sym_type != -1:
+            getsym()
+            sym, num, sym_type = la.cur_sym, la.cur_num, la.sym_type
+            if sym not in name_idx:
+                name_idx[sym] = len(self._names)
+                self._names.append(sym)
+            if num not in num_idx:
+                num_idx[num] = len(self._numbers)
+                self._numbers.append(num)
+            append_type(sym_type)
+            append_name(name_idx[sym])
+            append_num(num_idx[num])
+            append_line(la.line_num)
+        la.close_input()
+        self._pos = 0
+
+    def __contains__(self, sym_type):
+        """ Tell if there is a symbol of a type anywhere in the stream. """
+        return sym_type in self._types
+
+    def __len__(self):
+        """ Number of symbols, including the end of file. """
+        return len(self._types) - 1
+
+    def getsym(self):
+        """ Go to the next symbol. Stay at the end of file. """
+        if self._pos < len(self._types) - 1:
+            self._pos += 1
+
+    def peek(self, k=1):
+        """ Get the symbol type k symbols ahead of current symbol, or the end of file. """
+        return self._types[min(self._pos + k, len(self._types) - 1)]
+
+    def symbols(self, start, end):
+        """
+        Get symbols from position 'start' to 'end' as (symbol type, number or text), to compare symbols of
+        different streams.
+        """
+        number = MapInfo.mmap['number']
+        names = self._names
+        numbers = self._numbers
+        return tuple([(sym_type, numbers[num] if sym_type == number else names[name])
+                      for sym_type, name, num in zip(self._types[start:end], self._name_idx[start:end],
+                                                     self._num_idx[start:end])])
+
+    def mark(self):
+        return self._pos
+
+    def reset(self, pos):
+        self._pos = pos
+
+    def close_input(self):
+        pass
@@ -0,0 +1,508 @@
+"""
+Syntax tree optimization module.
+"""
+import copy
+import operator
+from syntax_tree import Node, Number, Variable, BinaryOp, Odd, SelfOp, Call, VarDecl, Assign, Read, Write, If, \
+    While, DoWhile, Repeat, For, Return, Block, Function
+
+# Operations on integers which never fail.
+_safe = {1, 2, 3, 4, 5, 6, 7, 8, 10, 13, 16}
+
+
+def transform(node, fn):
+    """
+    Replace every node of a tree, children first, with what 'fn' returns for it. Return the new root.
+    """
+    for field in node.fields:
+        val = getattr(node, field)
+        if isinstance(val, list):
+            setattr(node, field, [transform(child, fn) for child in val])
+        elif isinstance(val, Node):
+            setattr(node, field, transform(val, fn))
+    return fn(node)
+
+
+def pure(node, int_only):
+    """
+    Tell if evaluating an expression can't fail or change anything.
+    int_only: if every value of the program is an integer. Otherwise any operation could fail, like '1.5 XOR 1'.
+    """
+    if isinstance(node, (Number, Variable)):
+        return True
+    if not int_only:
+        return False
+    if isinstance(node, BinaryOp):
+        return node.opr in _safe and pure(node.left, int_only) and pure(node.right, int_only)
+    if isinstance(node, Odd):
+        return pure(node.operand, int_only)
+    return False
+
+
+class ConstantFolder:
+    """
+    Evaluate operations on numbers at compile time, unless the operation fails, like dividing by zero.
+    Adding or subtracting 0 and multiplying by 1 or 0 are simplified where the result is the same for any value.
+    int_only: if every value of the program is an integer, which is true when there is no division. Then 'x + 0' and
+              'x * 0' can be simplified too, as '-0.0 + 0' is '0.0' and '1.5 * 0' is '0.0'.
+    """
+    # Operations evaluated, keyed by operation code.
+    _folding = {
+        1: operator.sub, 2: operator.add, 10: operator.mul,
+        11: operator.truediv, 12: operator.mod, 13: operator.xor, 16: operator.and_,
+        3: lambda b, a: int(b > a), 4: lambda b, a: int(b < a), 5: lambda b, a: int(b >= a),
+        6: lambda b, a: int(b <= a), 7: lambda b, a: int(b == a), 8: lambda b, a: int(b != a)
+    }
+
+    def __init__(self, int_only=False):
+        self._int_only = int_only
+
+    def __call__(self, program):
+        return transform(program, self._fold)
+
+    @staticmethod
+    def _is_int(node, val=None):
+        return isinstance(node, Number) and type(node.value) is int and (val is None or node.value == val)
+
+    def _fold(self, node):
+        if isinstance(node, Odd):
+            if self._is_int(node.operand):
+                return Number(node.operand.value & 1)
+            return node
+        if not isinstance(node, BinaryOp):
+            return node
+        left, right, opr = node.left, node.right, node.opr
+        if isinstance(left, Number) and isinstance(right, Number):
+            try:
+                return Number(self._folding[opr](left.value, right.value))
+            except (ArithmeticError, TypeError):
+                return node
+        # x - 0 and x * 1
+        if opr == 1 and self._is_int(right, 0) or opr == 10 and self._is_int(right, 1):
+            return left
+        # 1 * x
+        if opr == 10 and self._is_int(left, 1):
+            return right
+        if self._int_only:
+            # x + 0 and 0 + x
+            if opr == 2 and self._is_int(right, 0):
+                return left
+            if opr == 2 and self._is_int(left, 0):
+                return right
+            # x * 0 and 0 * x
+            if opr == 10 and (self._is_int(right, 0) and pure(left, True)
+                              or self._is_int(left, 0) and pure(right, True)):
+                return Number(0)
+        return node
+
+
+class LoopInvariantMover:
+    """
+    Move operations out of loops whose operands never change in them. Each one is computed once, before the loop,
+    into a new variable defined in a block wrapping the loop, and the loop loads that variable instead. Inner loops
+    are done first, so an operation can move out of several loops.
+    Only operations which can't fail are moved (see 'pure'), as the loop may never run them.
+    The new variables take the first slots after the variables defined before the loop, so slots of variables
+    defined in the loop move up.
+    """
+    _loops = (While, DoWhile, Repeat, For)
+
+    def __init__(self, int_only=False):
+        self._int_only = int_only
+        # Number of new variables, to name them.
+        self._moved = 0
+
+    def __call__(self, program):
+        for func in program.functions:
+            if func.body is not None:
+                self._block(func.body, len(func.params))
+        return program
+
+    # count: number of variables in the frame when the block starts.
+    def _block(self, block, count):
+        statements = []
+        for statement in block.statements:
+            if isinstance(statement, self._loops):
+                # Variables defined in 'for' initialization stay in the enclosing block.
+                declared = self._declared(statement)
+                statements.extend(self._loop(statement, count))
+                count += declared
+                continue
+            if isinstance(statement, If):
+                for sub_block in statement.blocks:
+                    self._block(sub_block, count)
+                if statement.orelse is not None:
+                    self._block(statement.orelse, count)
+            elif isinstance(statement, Block):
+                self._block(statement, count)
+            elif isinstance(statement, VarDecl):
+                count += 1
+            statements.append(statement)
+        block.statements = statements
+
+    # Return the statements replacing a loop.
+    def _loop(self, loop, count):
+        init = []
+        if isinstance(loop, For):
+            count += self._declared(loop)
+            init, loop.init = loop.init, []
+        self._block(loop.body, count)
+        stored = set()
+        calls = self._stores(loop, stored)
+        # Variables defined in the loop are set again in every iteration.
+        self._variant = lambda address: address in stored or address >= count or address < 0 and calls
+        self._decls = {}
+        self._temps = []
+        self._hoist(loop)
+        if not self._decls:
+            loop.init = init
+            return [loop]
+        self._shift(loop, count, len(self._decls))
+        decls = sorted(self._decls.values(), key=lambda decl: decl[1])
+        for temp, slot in self._temps:
+            temp.address = slot + count
+        return init + [Block([decl for decl, slot in decls] + [loop], len(decls))]
+
+    # Number of variables defined in the initialization of a 'for' loop.
+    @staticmethod
+    def _declared(loop):
+        if not isinstance(loop, For):
+            return 0
+        return sum(isinstance(statement, VarDecl) for statement in loop.init)
+
+    # Add addresses stored in a tree to 'stored'. Return True if any function is called, which may store globals.
+    def _stores(self, node, stored):
+        calls = isinstance(node, Call)
+        if isinstance(node, (Assign, SelfOp)):
+            stored.add(node.address)
+        elif isinstance(node, Read):
+            stored.update(var.address for var in node.variables)
+        for child in node.children():
+            calls = self._stores(child, stored) or calls
+        return calls
+
+    def _invariant(self, node):
+        if isinstance(node, Variable):
+            return not self._variant(node.address)
+        return all(self._invariant(child) for child in node.children())
+
+    # Replace invariant operations in a tree with loads of new variables.
+    def _hoist(self, node):
+        for field in node.fields:
+            val = getattr(node, field)
+            if isinstance(val, list):
+                setattr(node, field, [self._replace(child) for child in val])
+            elif isinstance(val, Node):
+                setattr(node, field, self._replace(val))
+
+    def _replace(self, node):
+        if not isinstance(node, (BinaryOp, Odd)) or not pure(node, self._int_only) or not self._invariant(node):
+            self._hoist(node)
+            return node
+        # The same operation is computed once.
+        key = repr(node)
+        if key not in self._decls:
+            self._decls[key] = (VarDecl('$' + str(self._moved), node), len(self._decls))
+            self._moved += 1
+        decl, slot = self._decls[key]
+        temp = Variable(decl.name, None)
+        self._temps.append((temp, slot))
+        return temp
+
+    # Move slots from 'count' on up by 'num'.
+    def _shift(self, node, count, num):
+        if isinstance(node, (Variable, Assign, SelfOp)) and node.address is not None and node.address >= count:
+            node.address += num
+        for child in node.children():
+            self._shift(child, count, num)
+
+
+class StrengthReducer:
+    """
+    Replace '%' by a power of two with a mask, operation code 16:
+
+    x % 8           ->  x & 7
+
+    Only done if every value of the program is an integer, as floats can't be masked. Python integers behave as
+    two's complement for '&', so that a negative value gives the same result as '%'.
+    Multiplying by a power of two is left alone: a shift costs more than a multiplication on small integers.
+    """
+    def __init__(self, int_only=False):
+        self._int_only = int_only
+
+    def __call__(self, program):
+        if not self._int_only:
+            return program
+        return transform(program, self._reduce)
+
+    @staticmethod
+    def _is_power_of_two(node):
+        return isinstance(node, Number) and type(node.value) is int and node.value > 0 \
+            and node.value & (node.value - 1) == 0
+
+    def _reduce(self, node):
+        if isinstance(node, BinaryOp) and node.opr == 12 and self._is_power_of_two(node.right):
+            return BinaryOp(16, node.left, Number(node.right.value - 1))
+        return node
+
+
+class Inliner:
+    """
+    Put the bodies of small functions in place of calls to them, in functions defined after them.
+
+    A function whose body is only 'return e' is substituted into any expression calling it, with its parameters
+    replaced by the arguments, where that can't change what the program does:
+    - no argument reads a global variable if 'e' calls a function or changes a global variable;
+    - if every argument is pure (see 'pure'), only numbers and variables are copied to more than one place;
+    - otherwise every parameter is used once, in the order of the arguments, and 'e' computes nothing which could
+      fail or read a global variable before the last argument which is not pure.
+    Other functions are expanded where a call is a whole statement, the value of an assignment, a definition,
+    'write' or 'return', if they return only at their end. A parameter never changed by the body is replaced by its
+    argument if it is a number or a local variable, which the body can't change. The others are defined as new
+    variables after the variables of the caller, in a block holding the body, whose slots are moved after them.
+
+    budget: most nodes in the body of a function inlined.
+    After a run, 'depends' holds the names of the functions the code of each function depends on: those it calls,
+    as whether they are inlined depends on their bodies, and what those inlined into it depend on. 'bodies' holds
+    the body of every function which can be inlined, as it is inlined. A function taken from a cache is inlined
+    with the body kept in its CachedFunction, if any.
+    """
+    def __init__(self, int_only=False, budget=24):
+        self._int_only = int_only
+        self._budget = budget
+        self.depends = {}
+        self.bodies = {}
+        # Name -> Function which can be inlined, and the function being done.
+        self._callees = {}
+        self._caller = None
+
+    def __call__(self, program):
+        self.depends = {}
+        self.bodies = {}
+        self._callees = {}
+        for func in program.functions:
+            if func.body is None:
+                if func.cached is not None and func.cached.body is not None:
+                    self.depends[func.name] = set(func.cached.depends)
+                    self._callable(func, func.cached.body)
+                continue
+            self._caller = func.name
+            self.depends[func.name] = set()
+            self._record_calls(func.body)
+            func.body = transform(func.body, self._substitute)
+            self._block(func.body, len(func.params))
+            if self._size(func.body) <= self._budget and self._returns_at_end(func.body) \
+                    and not self._calls(func.body, func.name):
+                # Passes after this one change the body.
+                self._callable(func, copy.deepcopy(func.body))
+        return program
+
+    def _callable(self, func, body):
+        self.bodies[func.name] = body
+        self._callees[func.name] = Function(func.name, func.params, func.return_void, body)
+
+    @classmethod
+    def _size(cls, node):
+        return 1 + sum(cls._size(child) for child in node.children())
+
+    @classmethod
+    def _calls(cls, node, name):
+        if isinstance(node, Call) and node.name == name:
+            return True
+        return any(cls._calls(child, name) for child in node.children())
+
+    @classmethod
+    def _has_return(cls, node):
+        return isinstance(node, Return) or any(cls._has_return(child) for child in node.children())
+
+    # Tell if a function body returns nowhere but in its last statement.
+    def _returns_at_end(self, body):
+        statements = body.statements
+        if statements and isinstance(statements[-1], Return):
+            statements = statements[:-1]
+        return not any(self._has_return(statement) for statement in statements)
+
+    # Record functions called by the one being done, but itself.
+    def _record_calls(self, node):
+        if isinstance(node, Call) and node.name != self._caller:
+            self.depends[self._caller].add(node.name)
+        for child in node.children():
+            self._record_calls(child)
+
+    # Record that a function is inlined into the one being done.
+    def _inline(self, name):
+        self.depends[self._caller].update(self.depends.get(name, ()))
+
+    # Tell if evaluating an expression could change a variable or call a function.
+    @classmethod
+    def _has_effect(cls, node):
+        return isinstance(node, (SelfOp, Call)) or any(cls._has_effect(child) for child in node.children())
+
+    # Tell if evaluating an expression changes a local variable.
+    @classmethod
+    def _changes_locals(cls, node):
+        if isinstance(node, SelfOp) and node.address >= 0:
+            return True
+        return any(cls._changes_locals(child) for child in node.children())
+
+    @classmethod
+    def _reads_globals(cls, node):
+        if isinstance(node, Variable) and node.address < 0:
+            return True
+        return any(cls._reads_globals(child) for child in node.children())
+
+    # Add addresses of local variables changed in a tree to 'stored'.
+    @classmethod
+    def _stores(cls, node, stored):
+        if isinstance(node, (Assign, SelfOp)):
+            stored.add(node.address)
+        elif isinstance(node, Read):
+            stored.update(var.address for var in node.variables)
+        for child in node.children():
+            cls._stores(child, stored)
+
+    # Nodes of an expression in the order they are evaluated.
+    @classmethod
+    def _order(cls, node, res):
+        for child in node.children():
+            cls._order(child, res)
+        res.append(node)
+        return res
+
+    def _substitute(self, node):
+        if not isinstance(node, Call) or node.name not in self._callees:
+            return node
+        statements = self._callees[node.name].body.statements
+        if len(statements) != 1 or not isinstance(statements[0], Return) or statements[0].value is None:
+            return node
+        value = statements[0].value
+        stored = set()
+        self._stores(value, stored)
+        if stored:
+            return node
+        # The first argument is the last parameter slot.
+        args = node.args[::-1]
+        if self._has_effect(value) and any(self._reads_globals(arg) for arg in args):
+            return node
+        order = self._order(value, [])
+        uses = [idx for idx, var in enumerate(order) if isinstance(var, Variable) and var.address >= 0]
+        impure = [slot for slot, arg in enumerate(args) if not pure(arg, self._int_only)]
+        if not impure:
+            for slot, arg in enumerate(args):
+                if sum(order[idx].address == slot for idx in uses) > 1 and not isinstance(arg, (Number, Variable)):
+                    return node
+        else:
+            if [order[idx].address for idx in uses] != list(range(len(args) - 1, -1, -1)):
+                return node
+            last = uses[len(args) - 1 - min(impure)]
+            if any(not pure(var, self._int_only) or self._reads_globals(var) for var in order[:last]):
+                return node
+        self._inline(node.name)
+        return self._replace(copy.deepcopy(value), args)
+
+    # Replace parameters in an expression with copies of their arguments, by slot. Return the new root.
+    @staticmethod
+    def _replace(node, args):
+        def replace(var):
+            if isinstance(var, Variable) and var.address >= 0:
+                return copy.deepcopy(args[var.address])
+            return var
+        return transform(node, replace)
+
+    # Expand calls in the statements of a block, 'count' variables being defined when it starts.
+    def _block(self, block, count):
+        statements = []
+        for statement in block.statements:
+            statements.extend(self._statement(statement, count))
+            if isinstance(statement, VarDecl):
+                count += 1
+            elif isinstance(statement, For):
+                count += sum(isinstance(init, VarDecl) for init in statement.init)
+        block.statements = statements
+
+    # Return the statements replacing a statement.
+    def _statement(self, statement, count):
+        if isinstance(statement, If):
+            for sub_block in statement.blocks:
+                self._block(sub_block, count)
+            if statement.orelse is not None:
+                self._block(statement.orelse, count)
+        elif isinstance(statement, For):
+            self._block(statement.body, count + sum(isinstance(init, VarDecl) for init in statement.init))
+        elif isinstance(statement, (While, DoWhile, Repeat)):
+            self._block(statement.body, count)
+        elif isinstance(statement, Block):
+            self._block(statement, count)
+        elif isinstance(statement, Call) and self._expandable(statement, True):
+            return self._expand(statement, count, None)
+        elif isinstance(statement, Assign) and self._expandable(statement.value):
+            return self._expand(statement.value, count, lambda value: Assign(statement.name, statement.address, value))
+        elif isinstance(statement, Return) and self._expandable(statement.value):
+            return self._expand(statement.value, count, Return)
+        elif isinstance(statement, VarDecl) and self._expandable(statement.init):
+            # The variable takes its slot first, and is set at the end.
+            return [VarDecl(statement.name, None)] \
+                + self._expand(statement.init, count + 1, lambda value: Assign(statement.name, count, value))
+        elif isinstance(statement, Write) and any(self._expandable(value) for value in statement.values):
+            # Values are written one by one anyway.
+            res = []
+            for value in statement.values:
+                if self._expandable(value):
+                    res.extend(self._expand(value, count, lambda val: Write([val])))
+                else:
+                    res.append(Write([value]))
+            return res
+        return [statement]
+
+    # void: if the value of the call is not used.
+    def _expandable(self, node, void=False):
+        return isinstance(node, Call) and node.name in self._callees \
+            and self._callees[node.name].return_void == void
+
+    # Tell if an argument keeps its value while the callee runs: a number, or a local variable of the caller.
+    @staticmethod
+    def _constant(arg):
+        return isinstance(arg, Number) or isinstance(arg, Variable) and arg.address >= 0
+
+    # Return the statements running a call where 'count' variables are defined.
+    # last: statement made of the value returned, None for a function returning void.
+    def _expand(self, call, count, last):
+        self._inline(call.name)
+        callee = self._callees[call.name]
+        num = len(callee.params)
+        body = copy.deepcopy(callee.body)
+        stored = set()
+        self._stores(body, stored)
+        # Parameter slot -> argument replacing it, or None if it is defined.
+        # A local variable is read only where the callee uses it, after every argument is evaluated, so that it is
+        # kept only if no argument after it could change it.
+        args = [None] * num
+        for idx, arg in enumerate(call.args):
+            slot = num - 1 - idx
+            if slot not in stored and self._constant(arg) and \
+                    (isinstance(arg, Number) or not any(self._changes_locals(later) for later in call.args[idx + 1:])):
+                args[slot] = arg
+        decls = [VarDecl(name, arg) for name, arg, kept in zip(callee.params, call.args, args[::-1]) if kept is None]
+        # Defined parameters come first, in the order of the arguments, then variables of the body.
+        slots = {}
+        for slot in range(num - 1, -1, -1):
+            if args[slot] is None:
+                slots[slot] = count + len(slots)
+
+        def move(node):
+            if isinstance(node, Variable) and 0 <= node.address < num and args[node.address] is not None:
+                return copy.deepcopy(args[node.address])
+            if isinstance(node, (Variable, Assign, SelfOp)) and node.address >= 0:
+                node.address = slots[node.address] if node.address < num else count + len(decls) + node.address - num
+            return node
+        statements = decls + transform(body, move).statements
+        if statements and isinstance(statements[-1], Return):
+            value = statements.pop().value
+            if last is not None:
+                statements.append(last(value))
+        defined = sum(isinstance(statement, VarDecl) for statement in statements)
+        defined += sum(sum(isinstance(init, VarDecl) for init in statement.init)
+                       for statement in statements if isinstance(statement, For))
+        if not defined:
+            return statements
+        return [Block(statements, defined)]